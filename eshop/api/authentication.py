@@ -2,10 +2,17 @@
 Система аутентификации для API
 """
 
-from datetime import datetime, timedelta
-from typing import Optional
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
 
 import jwt
+import orjson
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework import status
@@ -18,6 +25,110 @@ from rest_framework.response import Response
 
 User = get_user_model()
 
+# Ключ подписи и JWS кодировщик создаются один раз при импорте
+_SIGNING_KEY = settings.SECRET_KEY.encode()
+_JWS = jwt.PyJWS(algorithms=['HS256'])
+
+
+def _b64url_decode(segment: bytes) -> bytes:
+    """Декодирование base64url без выравнивания"""
+    return base64.urlsafe_b64decode(segment + b'=' * (-len(segment) % 4))
+
+
+def decode_hs256(token: str) -> dict:
+    """
+    Проверка подписи HS256 и декодирование payload токена.
+    Алгоритм фиксирован, поэтому заголовок токена не разбирается.
+    """
+    try:
+        header, payload_segment, signature = token.encode().split(b'.')
+        signature = _b64url_decode(signature)
+    except ValueError as exc:
+        raise jwt.DecodeError('Invalid token segments') from exc
+
+    expected = hmac.new(
+        _SIGNING_KEY, header + b'.' + payload_segment, hashlib.sha256
+    ).digest()
+    if not hmac.compare_digest(expected, signature):
+        raise jwt.InvalidSignatureError('Signature verification failed')
+
+    try:
+        payload = orjson.loads(_b64url_decode(payload_segment))
+    except ValueError as exc:
+        raise jwt.DecodeError('Invalid payload') from exc
+
+    if not isinstance(payload, dict):
+        raise jwt.DecodeError('Invalid payload')
+
+    now = time.time()
+    exp = payload.get('exp')
+    if exp is not None:
+        if not isinstance(exp, (int, float)):
+            raise jwt.DecodeError('Expiration Time claim must be a number')
+        if now >= exp:
+            raise jwt.ExpiredSignatureError('Signature has expired')
+
+    nbf = payload.get('nbf')
+    if nbf is not None:
+        if not isinstance(nbf, (int, float)):
+            raise jwt.DecodeError('Not Before claim must be a number')
+        if now < nbf:
+            raise jwt.ImmatureSignatureError('The token is not yet valid')
+
+    return payload
+
+
+class TokenCache:
+    """
+    Процессный LRU кэш с TTL для декодированных JWT токенов.
+    Запись живет до истечения `exp` самого токена.
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _make_key(token: str) -> bytes:
+        """Компактный ключ вместо полного токена"""
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token: str) -> Optional[Any]:
+        """Получение значения, если токен еще не истек"""
+        key = self._make_key(token)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            value, exp = entry
+            if time.time() >= exp:
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, token: str, value: Any, exp: float) -> None:
+        """Сохранение значения до момента `exp`"""
+        key = self._make_key(token)
+        with self._lock:
+            self._data[key] = (value, exp)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Очистка кэша"""
+        with self._lock:
+            self._data.clear()
+
+
+# Кэш декодированных токенов: в нем только payload, а не пользователь,
+# поэтому деактивация пользователя действует на следующем же запросе
+_payload_cache = TokenCache()
+
 
 class JWTAuthentication(BaseAuthentication):
     """
@@ -34,15 +145,24 @@ class JWTAuthentication(BaseAuthentication):
         try:
             # Извлекаем токен из заголовка
             token = auth_header.split(' ')[1]
-            payload = jwt.decode(
-                token, settings.SECRET_KEY, algorithms=['HS256']
-            )
+
+            # Повторная проверка того же токена обходится без HMAC
+            payload = TokenManager.decode_token(token)
+            if payload is None:
+                return None
 
             user_id = payload.get('user_id')
             if user_id is None:
                 return None
 
-            user = User.objects.get(id=user_id)
+            # Пользователь читается на каждом запросе: отключенный
+            # пользователь не проходит аутентификацию и с живым токеном.
+            # Группы и права подгружаются сразу, чтобы проверки
+            # has_perm в представлениях не били в БД повторно
+            user = User.objects.prefetch_related(
+                'groups', 'user_permissions'
+            ).get(id=user_id, is_active=True)
+
             return (user, token)
 
         except (jwt.InvalidTokenError, User.DoesNotExist, IndexError):
@@ -78,26 +198,26 @@ class APIKeyAuthentication(BaseAuthentication):
         return 'X-API-Key'
 
 
+# Аутентификаторы не хранят состояния, поэтому создаются один раз,
+# а не при каждом создании HybridAuthentication (т.е. на каждый запрос)
+_jwt_auth = JWTAuthentication()
+_api_key_auth = APIKeyAuthentication()
+
+
 class HybridAuthentication(BaseAuthentication):
     """
     Гибридная аутентификация (JWT + API Key)
     """
 
-    def __init__(self):
-        self.jwt_auth = JWTAuthentication()
-        self.api_key_auth = APIKeyAuthentication()
+    # Сначала пробуем JWT, затем API ключ
+    auth_chain = (_jwt_auth.authenticate, _api_key_auth.authenticate)
 
     def authenticate(self, request):
         """Попытка аутентификации разными методами"""
-        # Сначала пробуем JWT
-        jwt_result = self.jwt_auth.authenticate(request)
-        if jwt_result:
-            return jwt_result
-
-        # Затем API ключ
-        api_key_result = self.api_key_auth.authenticate(request)
-        if api_key_result:
-            return api_key_result
+        for authenticate in self.auth_chain:
+            result = authenticate(request)
+            if result:
+                return result
 
         return None
 
@@ -114,23 +234,38 @@ class TokenManager:
     @staticmethod
     def generate_token(user: User, expires_in: int = 3600) -> str:
         """Генерация JWT токена"""
+        now = int(time.time())
         payload = {
             'user_id': user.id,
             'username': user.username,
-            'exp': datetime.utcnow() + timedelta(seconds=expires_in),
-            'iat': datetime.utcnow(),
+            'exp': now + expires_in,
+            'iat': now,
         }
 
-        return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+        return _JWS.encode(
+            json.dumps(payload, separators=(',', ':')).encode(),
+            _SIGNING_KEY,
+            algorithm='HS256',
+        )
 
     @staticmethod
     def decode_token(token: str) -> Optional[dict]:
-        """Декодирование JWT токена"""
+        """Декодирование JWT токена с кэшированием"""
+        payload = _payload_cache.get(token)
+        if payload is not None:
+            return payload
+
         try:
-            return jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = decode_hs256(token)
         except jwt.InvalidTokenError:
             return None
 
+        exp = payload.get('exp')
+        if exp is not None:
+            _payload_cache.set(token, payload, exp)
+
+        return payload
+
     @staticmethod
     def is_token_expired(token: str) -> bool:
         """Проверка истечения токена"""
@@ -142,7 +277,8 @@ class TokenManager:
         if not exp:
             return True
 
-        return datetime.utcnow() > datetime.fromtimestamp(exp)
+        # exp хранится в секундах от эпохи - сравниваем числа напрямую
+        return time.time() >= exp
 
 
 class AuthenticationMixin:
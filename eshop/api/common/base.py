@@ -1,7 +1,7 @@
 """
 Базовые классы для API
 """
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Union
 
 from django.db.models import QuerySet
 from rest_framework import status, viewsets
@@ -17,12 +17,14 @@ class BaseViewSet(viewsets.ModelViewSet):
         """Получение queryset с оптимизацией"""
         queryset = super().get_queryset()
 
-        # Автоматическое применение select_related для связанных полей
-        if hasattr(self, 'select_related_fields'):
+        # Автоматическое применение select_related для связанных полей.
+        # Пустой список пропускается: select_related() без аргументов
+        # присоединяет все внешние ключи
+        if getattr(self, 'select_related_fields', None):
             queryset = queryset.select_related(*self.select_related_fields)
 
         # Автоматическое применение prefetch_related для связанных полей
-        if hasattr(self, 'prefetch_related_fields'):
+        if getattr(self, 'prefetch_related_fields', None):
             queryset = queryset.prefetch_related(*self.prefetch_related_fields)
 
         return queryset
@@ -67,21 +69,27 @@ class BaseAPIView:
 
         return Response(response_data, status=status_code)
 
-    def get_paginated_response(self, data: List[Any],
+    def get_paginated_response(self, data: Union[QuerySet, List[Any]],
                               page: int = 1,
                               page_size: int = 20) -> Response:
         """Пагинированный ответ"""
         start = (page - 1) * page_size
         end = start + page_size
 
+        # Для QuerySet срез превращается в LIMIT/OFFSET на стороне БД
+        if isinstance(data, QuerySet):
+            total_count = data.count()
+        else:
+            total_count = len(data)
+
         paginated_data = {
-            'results': data[start:end],
+            'results': list(data[start:end]),
             'pagination': {
                 'page': page,
                 'page_size': page_size,
-                'total_count': len(data),
-                'total_pages': (len(data) + page_size - 1) // page_size,
-                'has_next': end < len(data),
+                'total_count': total_count,
+                'total_pages': (total_count + page_size - 1) // page_size,
+                'has_next': end < total_count,
                 'has_previous': page > 1
             }
         }
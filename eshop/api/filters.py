@@ -3,6 +3,8 @@
 """
 from typing import Any, Dict, List
 
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db import connections
 from django.db.models import Q
 from django_filters import rest_framework as filters
 
@@ -50,12 +52,6 @@ class ProductFilter(BaseFilterSet):
             'created': ['exact', 'gte', 'lte']
         }
 
-    def filter_available(self, queryset, name, value):
-        """Фильтр по доступности"""
-        if value is not None:
-            return queryset.filter(available=value)
-        return queryset
-
     def filter_price_range(self, queryset, name, value):
         """Фильтр по диапазону цен"""
         if value:
@@ -89,15 +85,42 @@ class SearchFilter:
     Универсальный фильтр поиска
     """
 
-    def __init__(self, search_fields: List[str], model_fields: Dict[str, str] = None):
+    def __init__(self, search_fields: List[str], model_fields: Dict[str, str] = None,
+                 vector_field: str = None, config: str = None):
         self.search_fields = search_fields
         self.model_fields = model_fields or {}
+        # Имя хранимого SearchVectorField с GIN-индексом, если он есть у модели
+        self.vector_field = vector_field
+        # Конфигурация полнотекстового поиска (должна совпадать с вектором)
+        self.config = config
 
     def filter(self, queryset, search_term: str) -> Any:
         """Фильтрация по поисковому запросу"""
         if not search_term:
             return queryset
 
+        # На PostgreSQL один полнотекстовый предикат заменяет
+        # N условий ILIKE '%term%', которые не используют индексы
+        if (not self.model_fields
+                and connections[queryset.db].vendor == 'postgresql'):
+            return self.filter_full_text(queryset, search_term)
+
+        return self.filter_icontains(queryset, search_term)
+
+    def filter_full_text(self, queryset, search_term: str) -> Any:
+        """Полнотекстовый поиск PostgreSQL"""
+        if self.vector_field:
+            # Хранимый вектор проверяется по GIN-индексу, без пересчета
+            # to_tsvector для каждой строки таблицы
+            return queryset.filter(
+                **{self.vector_field: SearchQuery(search_term, config=self.config)}
+            )
+        return queryset.annotate(
+            search_vector_=SearchVector(*self.search_fields, config=self.config)
+        ).filter(search_vector_=SearchQuery(search_term, config=self.config))
+
+    def filter_icontains(self, queryset, search_term: str) -> Any:
+        """Поиск по вхождению подстроки (для остальных СУБД)"""
         q_objects = Q()
 
         for field in self.search_fields:
@@ -127,16 +150,30 @@ class AdvancedFilter:
 
     def __init__(self):
         self.filters = {}
+        self._compiled = None
 
     def add_filter(self, name: str, filter_func):
         """Добавление фильтра"""
         self.filters[name] = filter_func
+        self._compiled = None
+
+    def compile(self):
+        """Однократная сборка списка зарегистрированных фильтров"""
+        self._compiled = tuple(self.filters.items())
+        return self._compiled
 
     def apply_filters(self, queryset, filter_params: Dict[str, Any]) -> Any:
         """Применение всех фильтров"""
-        for name, value in filter_params.items():
-            if name in self.filters and value is not None:
-                queryset = self.filters[name](queryset, value)
+        compiled = self._compiled
+        if compiled is None:
+            compiled = self.compile()
+
+        # Обходим зарегистрированные фильтры (их обычно меньше, чем
+        # параметров запроса) и берем значения из параметров
+        for name, filter_func in compiled:
+            value = filter_params.get(name)
+            if value is not None:
+                queryset = filter_func(queryset, value)
         return queryset
 
     def get_filter_description(self) -> Dict[str, str]:
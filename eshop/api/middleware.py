@@ -2,15 +2,76 @@
 Middleware для API
 """
 
+import hashlib
 import logging
 import time
+import uuid
+from collections import deque
 
+import orjson
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
 
 logger = logging.getLogger(__name__)
 
+API_PREFIX = '/api/'
+
+# Скользящее окно на sorted set: очистка, подсчет и добавление
+# выполняются атомарно за один вызов Redis.
+# Возвращает оставшуюся квоту или -1, если лимит исчерпан.
+RATE_LIMIT_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count >= limit then
+    return -1
+end
+
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('EXPIRE', key, window)
+return limit - count - 1
+"""
+
+
+def is_api_request(request):
+    """
+    Проверка, является ли запрос API запросом.
+
+    Префикс проверяется один раз на запрос первым API middleware,
+    остальные читают сохраненный результат.
+    """
+    try:
+        return request.api_request
+    except AttributeError:
+        request.api_request = request.path.startswith(API_PREFIX)
+        return request.api_request
+
+
+def get_request_credential(request):
+    """
+    Учетные данные запроса без обращения к request.user.
+
+    request.user ленивый: его вычисление стоит запроса к сессии и БД.
+    Здесь читаются только сырой заголовок Authorization и сессионная
+    cookie; их подлинность проверяет DRF.
+    """
+    return request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+
+
+def json_response(data, status=200):
+    """JSON ответ, сериализованный через orjson"""
+    return HttpResponse(
+        orjson.dumps(data), status=status, content_type='application/json'
+    )
+
 
 class APILoggingMiddleware(MiddlewareMixin):
     """
@@ -19,53 +80,63 @@ class APILoggingMiddleware(MiddlewareMixin):
 
     def process_request(self, request):
         """Обработка входящего запроса"""
-        if self._is_api_request(request):
-            request.start_time = time.time()
-            request.api_request = True
-
-            # Логируем входящий запрос
-            logger.info(
-                f'API Request: {request.method} {request.path}',
-                extra={
-                    'method': request.method,
-                    'path': request.path,
-                    'user': request.user.username
-                    if request.user.is_authenticated
-                    else 'anonymous',
-                    'ip': self._get_client_ip(request),
-                },
-            )
+        if is_api_request(request):
+            request.start_time = time.perf_counter()
+            request.api_version = self._get_api_version(request)
+
+            # Логируем входящий запрос. request.user здесь не трогаем:
+            # это ленивый объект, и его вычисление стоит запроса к сессии
+            # и БД. Пользователь попадает в лог ответа, когда DRF уже
+            # выполнил аутентификацию.
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    'API Request: %s %s',
+                    request.method,
+                    request.path,
+                    extra={
+                        'method': request.method,
+                        'path': request.path,
+                        'has_auth_header': (
+                            'HTTP_AUTHORIZATION' in request.META
+                        ),
+                        'ip': self._get_client_ip(request),
+                    },
+                )
 
     def process_response(self, request, response):
         """Обработка исходящего ответа"""
-        if hasattr(request, 'api_request') and request.api_request:
+        if is_api_request(request):
             # Вычисляем время выполнения
-            duration = time.time() - request.start_time
-
-            # Логируем ответ
-            logger.info(
-                f'API Response: {request.method} {request.path} - {response.status_code} ({duration:.3f}s)',
-                extra={
-                    'method': request.method,
-                    'path': request.path,
-                    'status_code': response.status_code,
-                    'duration': duration,
-                    'user': request.user.username
-                    if request.user.is_authenticated
-                    else 'anonymous',
-                },
-            )
+            duration = time.perf_counter() - request.start_time
+
+            # Логируем ответ. Extra (и пользователь) вычисляются, только
+            # если уровень INFO включен. Если ответ отдан до
+            # AuthenticationMiddleware (429), пользователя у запроса нет
+            if logger.isEnabledFor(logging.INFO):
+                user = getattr(request, 'user', None)
+                logger.info(
+                    'API Response: %s %s - %s (%.3fs)',
+                    request.method,
+                    request.path,
+                    response.status_code,
+                    duration,
+                    extra={
+                        'method': request.method,
+                        'path': request.path,
+                        'status_code': response.status_code,
+                        'duration': duration,
+                        'user': user.username
+                        if user is not None and user.is_authenticated
+                        else 'anonymous',
+                    },
+                )
 
             # Добавляем заголовки с метриками
             response['X-API-Response-Time'] = f'{duration:.3f}s'
-            response['X-API-Version'] = self._get_api_version(request)
+            response['X-API-Version'] = request.api_version
 
         return response
 
-    def _is_api_request(self, request):
-        """Проверка, является ли запрос API запросом"""
-        return request.path.startswith('/api/')
-
     def _get_client_ip(self, request):
         """Получение IP адреса клиента"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -77,10 +148,9 @@ class APILoggingMiddleware(MiddlewareMixin):
 
     def _get_api_version(self, request):
         """Получение версии API из пути"""
-        path_parts = request.path.split('/')
-        if len(path_parts) > 2 and path_parts[1] == 'api':
-            return path_parts[2] if len(path_parts) > 2 else 'v1'
-        return 'v1'
+        # Первый сегмент после префикса, без разбиения всего пути
+        version = request.path[len(API_PREFIX):].partition('/')[0]
+        return version or 'v1'
 
 
 class APIErrorHandlingMiddleware(MiddlewareMixin):
@@ -90,10 +160,12 @@ class APIErrorHandlingMiddleware(MiddlewareMixin):
 
     def process_exception(self, request, exception):
         """Обработка исключений"""
-        if self._is_api_request(request):
+        if is_api_request(request):
             # Логируем ошибку
             logger.error(
-                f'API Error: {request.method} {request.path}',
+                'API Error: %s %s',
+                request.method,
+                request.path,
                 extra={
                     'method': request.method,
                     'path': request.path,
@@ -107,7 +179,7 @@ class APIErrorHandlingMiddleware(MiddlewareMixin):
             )
 
             # Возвращаем JSON ответ с ошибкой
-            return JsonResponse(
+            return json_response(
                 {
                     'error': 'Internal Server Error',
                     'message': str(exception)
@@ -122,36 +194,32 @@ class APIErrorHandlingMiddleware(MiddlewareMixin):
 
         return None
 
-    def _is_api_request(self, request):
-        """Проверка, является ли запрос API запросом"""
-        return request.path.startswith('/api/')
-
 
 class APIRateLimitMiddleware(MiddlewareMixin):
     """
     Middleware для ограничения скорости API запросов
     """
 
+    window = 3600
+    user_limit = 1000
+    anon_limit = 100
+    key_prefix = 'api:ratelimit:'
+
     def __init__(self, get_response):
         super().__init__(get_response)
         self.request_counts = {}
         self.last_reset = time.time()
+        self.redis_script = self._get_redis_script()
 
     def process_request(self, request):
         """Обработка входящего запроса с проверкой лимитов"""
-        if self._is_api_request(request):
-            # Сбрасываем счетчики каждый час
-            current_time = time.time()
-            if current_time - self.last_reset > 3600:
-                self.request_counts.clear()
-                self.last_reset = current_time
-
+        if is_api_request(request):
             # Получаем ключ для пользователя
             user_key = self._get_user_key(request)
 
             # Проверяем лимиты
             if not self._check_rate_limit(user_key, request):
-                return JsonResponse(
+                return json_response(
                     {
                         'error': 'Rate limit exceeded',
                         'message': 'Too many requests. Please try again later.',
@@ -160,17 +228,32 @@ class APIRateLimitMiddleware(MiddlewareMixin):
                     status=429,
                 )
 
-    def _is_api_request(self, request):
-        """Проверка, является ли запрос API запросом"""
-        return request.path.startswith('/api/')
+    def _get_redis_script(self):
+        """Регистрация Lua скрипта, если кэш работает через Redis"""
+        try:
+            from django_redis import get_redis_connection
+
+            return get_redis_connection('default').register_script(
+                RATE_LIMIT_SCRIPT
+            )
+        except (ImportError, NotImplementedError):
+            # Кэш не Redis - используем счетчики в памяти процесса
+            return None
 
     def _get_user_key(self, request):
-        """Получение ключа пользователя для ограничений"""
-        if request.user.is_authenticated:
-            return f'user_{request.user.id}'
-        else:
-            ip = self._get_client_ip(request)
-            return f'ip_{ip}'
+        """
+        Получение ключа пользователя для ограничений.
+
+        Запросы с неверными учетными данными DRF дополнительно
+        ограничивает по IP (DEFAULT_THROTTLE_CLASSES).
+        """
+        credential = get_request_credential(request)
+        if credential:
+            # В ключ попадает хэш, а не сам токен
+            digest = hashlib.sha256(credential.encode()).hexdigest()[:32]
+            return f'auth_{digest}'
+        ip = self._get_client_ip(request)
+        return f'ip_{ip}'
 
     def _get_client_ip(self, request):
         """Получение IP адреса клиента"""
@@ -181,51 +264,90 @@ class APIRateLimitMiddleware(MiddlewareMixin):
             ip = request.META.get('REMOTE_ADDR')
         return ip
 
+    def _get_limit(self, request):
+        """Лимит запросов в окне для пользователя"""
+        if get_request_credential(request):
+            return self.user_limit
+        return self.anon_limit
+
     def _check_rate_limit(self, user_key, request):
         """Проверка лимита запросов"""
+        limit = self._get_limit(request)
+
+        if self.redis_script is not None:
+            from redis.exceptions import RedisError
+
+            try:
+                return self._check_rate_limit_redis(user_key, limit) >= 0
+            except RedisError:
+                logger.warning(
+                    'Redis недоступен, лимиты считаются в памяти процесса'
+                )
+
+        return self._check_rate_limit_local(user_key, limit)
+
+    def _check_rate_limit_redis(self, user_key, limit):
+        """Проверка лимита в Redis, возвращает оставшуюся квоту"""
+        now = time.time()
+        return self.redis_script(
+            keys=[f'{self.key_prefix}{user_key}'],
+            args=[now, self.window, limit, f'{now}:{uuid.uuid4().hex}'],
+        )
+
+    def _check_rate_limit_local(self, user_key, limit):
+        """Проверка лимита по счетчикам в памяти процесса"""
         current_time = time.time()
 
-        if user_key not in self.request_counts:
-            self.request_counts[user_key] = []
+        # Сбрасываем счетчики каждый час
+        if current_time - self.last_reset > self.window:
+            self.request_counts.clear()
+            self.last_reset = current_time
+
+        timestamps = self.request_counts.get(user_key)
+        if timestamps is None:
+            # Отклоненные запросы не сохраняются, так что длина
+            # очереди не превышает лимит
+            timestamps = deque(maxlen=limit)
+            self.request_counts[user_key] = timestamps
 
-        # Удаляем старые запросы (старше часа)
-        self.request_counts[user_key] = [
-            req_time
-            for req_time in self.request_counts[user_key]
-            if current_time - req_time < 3600
-        ]
+        # Удаляем старые запросы (старше часа). Время добавляется
+        # по возрастанию, поэтому устаревшие записи всегда в начале.
+        cutoff = current_time - self.window
+        while timestamps and timestamps[0] <= cutoff:
+            timestamps.popleft()
 
         # Проверяем лимит
-        limit = 1000 if request.user.is_authenticated else 100
-        if len(self.request_counts[user_key]) >= limit:
+        if len(timestamps) >= limit:
             return False
 
         # Добавляем текущий запрос
-        self.request_counts[user_key].append(current_time)
+        timestamps.append(current_time)
         return True
 
 
 class APICacheMiddleware(MiddlewareMixin):
     """
-    Middleware для кэширования API ответов
+    Middleware для заголовков кэширования API ответов
     """
 
-    def process_request(self, request):
-        """Обработка входящего запроса с проверкой кэша"""
-        if self._is_api_request(request) and request.method == 'GET':
-            # Здесь можно добавить логику кэширования
-            # Например, проверка кэша Redis
-            pass
+    max_age = 300  # 5 минут
 
     def process_response(self, request, response):
         """Обработка исходящего ответа с кэшированием"""
-        if self._is_api_request(request) and request.method == 'GET':
-            # Добавляем заголовки кэширования
-            response['Cache-Control'] = 'public, max-age=300'  # 5 минут
-            response['Vary'] = 'Accept, Accept-Language'
+        if (
+            is_api_request(request)
+            and request.method == 'GET'
+            and response.status_code == 200
+            and not response.has_header('Cache-Control')
+        ):
+            # Ответы на запросы с учетными данными (корзина, профиль)
+            # не должны попадать в общие кэши
+            if get_request_credential(request):
+                patch_cache_control(response, private=True, max_age=0)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=self.max_age
+                )
+            patch_vary_headers(response, ('Accept', 'Accept-Language'))
 
         return response
-
-    def _is_api_request(self, request):
-        """Проверка, является ли запрос API запросом"""
-        return request.path.startswith('/api/')
@@ -3,6 +3,9 @@
 """
 
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 from rest_framework.pagination import (
     CursorPagination,
     LimitOffsetPagination,
@@ -11,11 +14,55 @@ from rest_framework.pagination import (
 from rest_framework.response import Response
 
 
+class ApproxCountPaginator(Paginator):
+    """
+    Paginator с приблизительным подсчетом для больших таблиц PostgreSQL
+
+    Для запросов без фильтров количество берется из статистики
+    планировщика (pg_class.reltuples) вместо SELECT COUNT(*).
+    """
+
+    approx_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        """Количество объектов (приблизительное для больших таблиц)"""
+        estimate = self._get_estimated_count()
+        if estimate is not None and estimate >= self.approx_count_threshold:
+            return estimate
+        return super().count
+
+    def _get_estimated_count(self):
+        """Оценка количества строк из статистики PostgreSQL"""
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return None
+
+        query = queryset.query
+        if query.where or query.is_sliced or query.combinator or query.distinct:
+            return None
+
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::BIGINT FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+
+        return row[0] if row else None
+
+
 class StandardPagination(PageNumberPagination):
     """
     Стандартная пагинация по страницам
     """
 
+    django_paginator_class = ApproxCountPaginator
+
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -61,9 +108,14 @@ class LimitOffsetPagination(LimitOffsetPagination):
 class CursorPagination(CursorPagination):
     """
     Пагинация по курсору для больших наборов данных
+
+    Вместо OFFSET используется условие по индексированному полю
+    `created`, поэтому глубокие страницы не сканируют пропущенные строки.
     """
 
     page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
     ordering = '-created'
     cursor_query_param = 'cursor'
 
@@ -78,6 +130,17 @@ class CursorPagination(CursorPagination):
         )
 
 
+class ProductCursorPagination(CursorPagination):
+    """
+    Пагинация по курсору для каталога товаров
+
+    Сортировка по первичному ключу: курсор однозначен и страница
+    выбирается поиском по индексу без COUNT(*).
+    """
+
+    ordering = '-id'
+
+
 class CustomPagination:
     """
     Кастомная пагинация с гибкими настройками
@@ -100,7 +163,7 @@ class CustomPagination:
         except (TypeError, ValueError):
             page = 1
 
-        paginator = Paginator(queryset, page_size)
+        paginator = ApproxCountPaginator(queryset, page_size)
 
         try:
             queryset = paginator.page(page)
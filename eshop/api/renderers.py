@@ -0,0 +1,59 @@
+"""
+Рендереры и парсеры JSON на orjson
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Типы, которых orjson не знает (Decimal, ленивые строки, QuerySet и т.п.),
+# и даты передаются кодировщику DRF, чтобы формат ответа не изменился
+_drf_default = JSONEncoder().default
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson: сериализация в C без промежуточной строки
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Рендеринг данных в JSON (байты)"""
+        if data is None:
+            return b''
+
+        # Форматированный вывод (например, для Browsable API) оставляем DRF
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_drf_default, option=ORJSON_OPTIONS)
+
+        # Как и DRF, экранируем U+2028/U+2029 для совместимости с JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029'
+            )
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSON-парсер на orjson
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Разбор тела запроса в формате JSON"""
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8').lower()
+
+        # orjson принимает только UTF-8, прочие кодировки разбирает DRF
+        if encoding.replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,21 @@
+"""
+Сигналы API приложения
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from main.models import Category, Product
+
+from .v1.views import FEATURED_PRODUCTS_CACHE_KEY
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_featured_products(sender, **kwargs):
+    """
+    Сброс кэша популярных товаров при изменении любого товара или
+    категории (данные категории входят в закэшированный JSON)
+    """
+    cache.delete(FEATURED_PRODUCTS_CACHE_KEY)
@@ -2,49 +2,72 @@
 Тесты для API приложения
 """
 
-import json
+import logging
+import uuid
+from decimal import Decimal
+from unittest import mock, skipUnless
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
 from main.models import Cart, CartItem, Category, Product
 from rest_framework import status
-from rest_framework.test import APIClient, APITestCase
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
 
+from .authentication import JWTAuthentication, TokenManager
+from .middleware import APILoggingMiddleware, APIRateLimitMiddleware
+from .v1.views import FEATURED_PRODUCTS_CACHE_KEY
 
+
+# Пароли в тестах не проверяются (используется force_authenticate),
+# поэтому дорогой PBKDF2 заменяем быстрым хэшером
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
 class APIBaseTestCase(APITestCase):
     """
     Базовый класс для тестов API
     """
 
-    def setUp(self):
-        """Настройка тестов"""
-        self.client = APIClient()
-
+    @classmethod
+    def setUpTestData(cls):
+        """Создание тестовых данных один раз на класс"""
         # Создаем тестового пользователя
-        self.user = User.objects.create_user(
+        cls.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
             password='testpass123',
         )
 
         # Создаем тестовую категорию
-        self.category = Category.objects.create(
-            name='Test Category', slug='test-category'
+        [cls.category] = Category.objects.bulk_create(
+            [Category(name='Test Category', slug='test-category')]
         )
 
-        # Создаем тестовый товар
-        self.product = Product.objects.create(
+        # Создаем тестовый товар (через save, который заполняет
+        # поисковый вектор на PostgreSQL)
+        cls.product = Product.objects.create(
             name='Test Product',
             slug='test-product',
             description='Test Description',
-            price=100.00,
-            category=self.category,
+            price=Decimal('100.00'),
+            category=cls.category,
             available=True,
         )
 
         # Создаем тестовую корзину
-        self.cart = Cart.objects.create(user=self.user)
+        cls.cart = Cart.objects.create(user=cls.user)
+
+    def setUp(self):
+        """Настройка тестов"""
+        self.client = APIClient()
 
     def authenticate_user(self):
         """Аутентификация пользователя"""
@@ -56,21 +79,45 @@ class CategoryAPITestCase(APIBaseTestCase):
     Тесты для API категорий
     """
 
+    @classmethod
+    def setUpTestData(cls):
+        """URL вычисляются один раз на класс"""
+        super().setUpTestData()
+        slug = {'slug': cls.category.slug}
+        cls.list_url = reverse('api:api-v1:category-list')
+        cls.detail_url = reverse('api:api-v1:category-detail', kwargs=slug)
+        cls.products_url = reverse('api:api-v1:category-products', kwargs=slug)
+
     def test_category_list(self):
         """Тест получения списка категорий"""
-        url = reverse('api-v1:category-list')
-        response = self.client.get(url)
+        response = self.client.get(self.list_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('results', response.data)
         self.assertEqual(len(response.data['results']), 1)
 
+    def test_category_list_ordered_by_name(self):
+        """Тест: список категорий упорядочен по названию"""
+        # Созданы не в алфавитном порядке
+        Category.objects.bulk_create([
+            Category(name='Zeta', slug='zeta'),
+            Category(name='Alpha', slug='alpha'),
+        ])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(
+            [category['name'] for category in response.data['results']],
+            ['Alpha', 'Test Category', 'Zeta'],
+        )
+        # Порядок задан в SQL, а не случайно совпал с порядком вставки
+        # Последний запрос выбирает страницу (первый - COUNT пагинатора)
+        self.assertIn('ORDER BY', queries.captured_queries[-1]['sql'])
+
     def test_category_detail(self):
         """Тест получения детальной информации о категории"""
-        url = reverse(
-            'api-v1:category-detail', kwargs={'slug': self.category.slug}
-        )
-        response = self.client.get(url)
+        response = self.client.get(self.detail_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['name'], self.category.name)
@@ -78,10 +125,7 @@ class CategoryAPITestCase(APIBaseTestCase):
 
     def test_category_products(self):
         """Тест получения товаров категории"""
-        url = reverse(
-            'api-v1:category-products', kwargs={'slug': self.category.slug}
-        )
-        response = self.client.get(url)
+        response = self.client.get(self.products_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('results', response.data)
@@ -93,21 +137,50 @@ class ProductAPITestCase(APIBaseTestCase):
     Тесты для API товаров
     """
 
+    @classmethod
+    def setUpTestData(cls):
+        """URL вычисляются один раз на класс"""
+        super().setUpTestData()
+        slug = {'slug': cls.product.slug}
+        cls.list_url = reverse('api:api-v1:product-list')
+        cls.detail_url = reverse('api:api-v1:product-detail', kwargs=slug)
+        cls.search_url = reverse('api:api-v1:product-search')
+        cls.related_url = reverse('api:api-v1:product-related', kwargs=slug)
+        cls.featured_url = reverse('api:api-v1:product-featured')
+
     def test_product_list(self):
         """Тест получения списка товаров"""
-        url = reverse('api-v1:product-list')
-        response = self.client.get(url)
+        response = self.client.get(self.list_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('results', response.data)
         self.assertEqual(len(response.data['results']), 1)
 
+
+    def test_product_list_category_counts_without_per_row_queries(self):
+        """Тест: количество товаров во вложенных категориях без COUNT на строку"""
+        other = Category.objects.create(name='Other Category', slug='other')
+        Product.objects.bulk_create([
+            Product(
+                name=f'Product {i}', slug=f'product-{i}',
+                price=Decimal('10.00'), category=other, available=True,
+            )
+            for i in range(3)
+        ])
+
+        # Товары и категории с количеством - по одному запросу
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_url)
+
+        counts = {
+            item['category']['slug']: item['category']['products_count']
+            for item in response.data['results']
+        }
+        self.assertEqual(counts, {'test-category': 1, 'other': 3})
+
     def test_product_detail(self):
         """Тест получения детальной информации о товаре"""
-        url = reverse(
-            'api-v1:product-detail', kwargs={'slug': self.product.slug}
-        )
-        response = self.client.get(url)
+        response = self.client.get(self.detail_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['name'], self.product.name)
@@ -115,8 +188,7 @@ class ProductAPITestCase(APIBaseTestCase):
 
     def test_product_search(self):
         """Тест поиска товаров"""
-        url = reverse('api-v1:product-search')
-        response = self.client.get(url, {'query': 'Test'})
+        response = self.client.get(self.search_url, {'query': 'Test'})
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('results', response.data)
@@ -129,25 +201,72 @@ class ProductAPITestCase(APIBaseTestCase):
             name='Related Product',
             slug='related-product',
             description='Related Description',
-            price=150.00,
+            price=Decimal('150.00'),
             category=self.category,
             available=True,
         )
 
-        url = reverse(
-            'api-v1:product-related', kwargs={'slug': self.product.slug}
-        )
-        response = self.client.get(url)
+        response = self.client.get(self.related_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_product_featured(self):
+        """Тест получения популярных товаров"""
+        response = self.client.get(self.featured_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(response.json()[0]['slug'], self.product.slug)
+
+    def test_product_featured_cached(self):
+        """Тест кэширования популярных товаров (повторный запрос без БД)"""
+        cache.delete(FEATURED_PRODUCTS_CACHE_KEY)
+        first = self.client.get(self.featured_url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.featured_url)
+
+        self.assertEqual(second.content, first.content)
+
+    def test_product_featured_invalidated_on_product_change(self):
+        """Тест сброса кэша популярных товаров при изменении товара"""
+        self.client.get(self.featured_url)
+
+        self.product.name = 'Renamed Product'
+        self.product.save()
+
+        response = self.client.get(self.featured_url)
+        self.assertEqual(response.json()[0]['name'], 'Renamed Product')
+
+    def test_product_featured_invalidated_on_category_change(self):
+        """Тест сброса кэша популярных товаров при изменении категории"""
+        self.client.get(self.featured_url)
+
+        self.category.name = 'Renamed Category'
+        self.category.save()
+
+        response = self.client.get(self.featured_url)
+        self.assertEqual(
+            response.json()[0]['category']['name'], 'Renamed Category'
+        )
+
 
 class CartAPITestCase(APIBaseTestCase):
     """
     Тесты для API корзины
     """
 
+    @classmethod
+    def setUpTestData(cls):
+        """URL вычисляются один раз на класс"""
+        super().setUpTestData()
+        pk = {'pk': cls.cart.pk}
+        cls.list_url = reverse('api:api-v1:cart-list')
+        cls.add_item_url = reverse('api:api-v1:cart-add-item', kwargs=pk)
+        cls.clear_url = reverse('api:api-v1:cart-clear', kwargs=pk)
+        cls.summary_url = reverse('api:api-v1:cart-summary', kwargs=pk)
+
     def setUp(self):
         """Дополнительная настройка для тестов корзины"""
         super().setUp()
@@ -155,8 +274,7 @@ class CartAPITestCase(APIBaseTestCase):
 
     def test_cart_list(self):
         """Тест получения списка корзин пользователя"""
-        url = reverse('api-v1:cart-list')
-        response = self.client.get(url)
+        response = self.client.get(self.list_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('results', response.data)
@@ -167,17 +285,15 @@ class CartAPITestCase(APIBaseTestCase):
         # Удаляем существующую корзину
         Cart.objects.filter(user=self.user).delete()
 
-        url = reverse('api-v1:cart-list')
-        response = self.client.post(url, {})
+        response = self.client.post(self.list_url, {})
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Cart.objects.filter(user=self.user).count(), 1)
 
     def test_cart_add_item(self):
         """Тест добавления товара в корзину"""
-        url = reverse('api-v1:cart-add-item', kwargs={'pk': self.cart.pk})
         data = {'product_id': self.product.id, 'quantity': 2}
-        response = self.client.post(url, data)
+        response = self.client.post(self.add_item_url, data)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 1)
@@ -186,12 +302,11 @@ class CartAPITestCase(APIBaseTestCase):
     def test_cart_clear(self):
         """Тест очистки корзины"""
         # Добавляем товар в корзину
-        CartItem.objects.create(
-            cart=self.cart, product=self.product, quantity=1
+        CartItem.objects.bulk_create(
+            [CartItem(cart=self.cart, product=self.product, quantity=1)]
         )
 
-        url = reverse('api-v1:cart-clear', kwargs={'pk': self.cart.pk})
-        response = self.client.post(url)
+        response = self.client.post(self.clear_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 0)
@@ -199,16 +314,15 @@ class CartAPITestCase(APIBaseTestCase):
     def test_cart_summary(self):
         """Тест получения сводки корзины"""
         # Добавляем товар в корзину
-        CartItem.objects.create(
-            cart=self.cart, product=self.product, quantity=2
+        CartItem.objects.bulk_create(
+            [CartItem(cart=self.cart, product=self.product, quantity=2)]
         )
 
-        url = reverse('api-v1:cart-summary', kwargs={'pk': self.cart.pk})
-        response = self.client.get(url)
+        response = self.client.get(self.summary_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('total_items', response.data)
-        self.assertIn('total_price', response.data)
+        self.assertEqual(response.data['total_items'], 2)
+        self.assertEqual(response.data['total_price'], 200)
         self.assertEqual(response.data['items_count'], 1)
 
 
@@ -217,20 +331,31 @@ class CartItemAPITestCase(APIBaseTestCase):
     Тесты для API товаров в корзине
     """
 
+    @classmethod
+    def setUpTestData(cls):
+        """Дополнительные данные для тестов товаров корзины"""
+        super().setUpTestData()
+
+        # Создаем товар в корзине
+        [cls.cart_item] = CartItem.objects.bulk_create(
+            [CartItem(cart=cls.cart, product=cls.product, quantity=1)]
+        )
+
+        # URL вычисляются один раз на класс
+        pk = {'pk': cls.cart_item.pk}
+        cls.list_url = reverse('api:api-v1:cart-item-list')
+        cls.detail_url = reverse('api:api-v1:cart-item-detail', kwargs=pk)
+        cls.increment_url = reverse('api:api-v1:cart-item-increment', kwargs=pk)
+        cls.decrement_url = reverse('api:api-v1:cart-item-decrement', kwargs=pk)
+
     def setUp(self):
         """Дополнительная настройка для тестов товаров корзины"""
         super().setUp()
         self.authenticate_user()
 
-        # Создаем товар в корзине
-        self.cart_item = CartItem.objects.create(
-            cart=self.cart, product=self.product, quantity=1
-        )
-
     def test_cart_item_list(self):
         """Тест получения списка товаров корзины"""
-        url = reverse('api-v1:cartitem-list')
-        response = self.client.get(url)
+        response = self.client.get(self.list_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('results', response.data)
@@ -238,11 +363,8 @@ class CartItemAPITestCase(APIBaseTestCase):
 
     def test_cart_item_update(self):
         """Тест обновления товара в корзине"""
-        url = reverse(
-            'api-v1:cartitem-detail', kwargs={'pk': self.cart_item.pk}
-        )
         data = {'quantity': 3}
-        response = self.client.patch(url, data)
+        response = self.client.patch(self.detail_url, data)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.cart_item.refresh_from_db()
@@ -250,12 +372,12 @@ class CartItemAPITestCase(APIBaseTestCase):
 
     def test_cart_item_increment(self):
         """Тест увеличения количества товара"""
-        url = reverse(
-            'api-v1:cartitem-increment', kwargs={'pk': self.cart_item.pk}
-        )
-        response = self.client.post(url)
+        # Чтение позиции и UPDATE ... RETURNING, без повторного SELECT
+        with self.assertNumQueries(2):
+            response = self.client.post(self.increment_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'quantity': 2})
         self.cart_item.refresh_from_db()
         self.assertEqual(self.cart_item.quantity, 2)
 
@@ -265,21 +387,16 @@ class CartItemAPITestCase(APIBaseTestCase):
         self.cart_item.quantity = 2
         self.cart_item.save()
 
-        url = reverse(
-            'api-v1:cartitem-decrement', kwargs={'pk': self.cart_item.pk}
-        )
-        response = self.client.post(url)
+        response = self.client.post(self.decrement_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'quantity': 1})
         self.cart_item.refresh_from_db()
         self.assertEqual(self.cart_item.quantity, 1)
 
     def test_cart_item_delete_on_zero(self):
         """Тест удаления товара при нулевом количестве"""
-        url = reverse(
-            'api-v1:cartitem-decrement', kwargs={'pk': self.cart_item.pk}
-        )
-        response = self.client.post(url)
+        response = self.client.post(self.decrement_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('message', response.data)
@@ -293,6 +410,14 @@ class UserProfileAPITestCase(APIBaseTestCase):
     Тесты для API профиля пользователя
     """
 
+    @classmethod
+    def setUpTestData(cls):
+        """URL вычисляются один раз на класс"""
+        super().setUpTestData()
+        cls.list_url = reverse('api:api-v1:profile-list')
+        cls.me_url = reverse('api:api-v1:profile-me')
+        cls.orders_url = reverse('api:api-v1:profile-orders')
+
     def setUp(self):
         """Дополнительная настройка для тестов профиля"""
         super().setUp()
@@ -300,8 +425,7 @@ class UserProfileAPITestCase(APIBaseTestCase):
 
     def test_profile_list(self):
         """Тест получения списка профилей"""
-        url = reverse('api-v1:profile-list')
-        response = self.client.get(url)
+        response = self.client.get(self.list_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('results', response.data)
@@ -309,8 +433,7 @@ class UserProfileAPITestCase(APIBaseTestCase):
 
     def test_profile_me(self):
         """Тест получения профиля текущего пользователя"""
-        url = reverse('api-v1:profile-me')
-        response = self.client.get(url)
+        response = self.client.get(self.me_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['username'], self.user.username)
@@ -318,36 +441,41 @@ class UserProfileAPITestCase(APIBaseTestCase):
 
     def test_profile_orders(self):
         """Тест получения истории заказов"""
-        url = reverse('api-v1:profile-orders')
-        response = self.client.get(url)
+        response = self.client.get(self.orders_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('message', response.data)
 
 
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
 class APIAuthenticationTestCase(APITestCase):
     """
     Тесты аутентификации API
     """
 
-    def setUp(self):
-        """Настройка тестов"""
-        self.client = APIClient()
-        self.user = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        """Создание тестовых данных один раз на класс"""
+        cls.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
             password='testpass123',
         )
 
+        # URL вычисляются один раз на класс
+        cls.category_list_url = reverse('api:api-v1:category-list')
+        cls.profile_me_url = reverse('api:api-v1:profile-me')
+
+    def setUp(self):
+        """Настройка тестов"""
+        self.client = APIClient()
+
     def test_anonymous_access_to_public_endpoints(self):
         """Тест доступа анонимных пользователей к публичным эндпоинтам"""
         # Создаем тестовую категорию
-        category = Category.objects.create(
-            name='Test Category', slug='test-category'
-        )
+        Category.objects.create(name='Test Category', slug='test-category')
 
-        url = reverse('api-v1:category-list')
-        response = self.client.get(url)
+        response = self.client.get(self.category_list_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
@@ -356,14 +484,134 @@ class APIAuthenticationTestCase(APITestCase):
         self.client.force_authenticate(user=self.user)
 
         # Тест доступа к защищенным эндпоинтам
-        url = reverse('api-v1:profile-me')
-        response = self.client.get(url)
+        response = self.client.get(self.profile_me_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_unauthenticated_user_denied(self):
         """Тест отказа в доступе неаутентифицированным пользователям"""
-        url = reverse('api-v1:profile-me')
-        response = self.client.get(url)
+        response = self.client.get(self.profile_me_url)
+
+        # Первая схема аутентификации - сессионная, у нее нет заголовка
+        # WWW-Authenticate, поэтому DRF отвечает 403, а не 401
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class JWTAuthenticationTestCase(APITestCase):
+    """
+    Тесты JWT аутентификации
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создание тестовых данных один раз на класс"""
+        cls.user = User.objects.create_user(
+            username='jwtuser',
+            password='testpass123',
+        )
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        return JWTAuthentication().authenticate(request)
+
+    def test_valid_token(self):
+        """Тест аутентификации по действующему токену"""
+        token = TokenManager.generate_token(self.user)
+
+        user, _ = self.authenticate(token)
+
+        self.assertEqual(user, self.user)
+        # Повторная проверка (payload из кэша) тоже проходит
+        self.assertEqual(self.authenticate(token)[0], self.user)
+
+    def test_deactivated_user_denied(self):
+        """Тест: отключенный пользователь не проходит с кэшированным токеном"""
+        token = TokenManager.generate_token(self.user)
+        self.assertIsNotNone(self.authenticate(token))
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        self.assertIsNone(self.authenticate(token))
+
+
+class APIMiddlewareTestCase(APITestCase):
+    """
+    Тесты API middleware (логирование)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создание тестовых данных один раз на класс"""
+        cls.category_list_url = reverse('api:api-v1:category-list')
+
+    def test_logging_does_not_resolve_user_when_info_disabled(self):
+        """Тест: при выключенном INFO ленивый request.user не вычисляется"""
+        request = RequestFactory().get(self.category_list_url)
+        request.user = SimpleLazyObject(
+            lambda: self.fail('request.user не должен вычисляться')
+        )
+        middleware = APILoggingMiddleware(lambda request: HttpResponse())
+
+        with mock.patch.object(
+            logging.getLogger('api.middleware'), 'isEnabledFor',
+            return_value=False,
+        ):
+            response = middleware(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-API-Response-Time', response)
+
+
+class APIRateLimitTestCase(APITestCase):
+    """
+    Тесты ограничения скорости API запросов (middleware вызывается
+    напрямую: в MIDDLEWARE он не подключен)
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создание тестовых данных один раз на класс"""
+        cls.category_list_url = reverse('api:api-v1:category-list')
+
+    def setUp(self):
+        """Настройка тестов"""
+        patcher = mock.patch.object(APIRateLimitMiddleware, 'anon_limit', 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_redis_error_falls_back_to_local_counters(self):
+        """Тест: при ошибке Redis лимит считается в памяти процесса"""
+        from redis.exceptions import ConnectionError as RedisConnectionError
+
+        middleware = APIRateLimitMiddleware(lambda request: HttpResponse())
+        middleware.redis_script = mock.Mock(
+            side_effect=RedisConnectionError('down')
+        )
+        request = RequestFactory().get(self.category_list_url)
+
+        with self.assertLogs('api.middleware', 'WARNING'):
+            statuses = [middleware(request).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(middleware.redis_script.call_count, 3)
+
+    @skipUnless(settings.REDIS_URL, 'нужен Redis (REDIS_URL)')
+    def test_redis_sliding_window(self):
+        """Тест Lua скрипта скользящего окна на настоящем Redis"""
+        from django_redis import get_redis_connection
+
+        middleware = APIRateLimitMiddleware(lambda request: HttpResponse())
+        key = f'test_{uuid.uuid4().hex}'
+        self.addCleanup(
+            get_redis_connection('default').delete,
+            f'{middleware.key_prefix}{key}',
+        )
+
+        remaining = [
+            middleware._check_rate_limit_redis(key, 2) for _ in range(3)
+        ]
 
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(remaining, [1, 0, -1])
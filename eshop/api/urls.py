@@ -42,7 +42,7 @@ urlpatterns = [
     # Корневой URL API
     path('', APIInfoView.as_view(), name='api-info'),
     # API версии 1
-    path('v1/', include(v1_urls)),
+    path('v1/', include((v1_urls, 'api-v1'))),
     # Автоматическая документация API
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
     path(
@@ -14,14 +14,12 @@ router.register(r'carts', views.CartViewSet, basename='cart')
 router.register(r'cart-items', views.CartItemViewSet, basename='cart-item')
 router.register(r'profile', views.UserProfileViewSet, basename='profile')
 
+# Маршруты роутера собираются один раз при импорте, а не на первом запросе.
+# Поиск доступен как products/search/ (имя product-search) через роутер
+router_urls = list(router.urls)
+
 # URL маршруты для API v1
 urlpatterns = [
     # Основные маршруты роутера
-    path('', include(router.urls)),
-    
-
-    
-    # Дополнительные маршруты
-    path('search/', views.ProductViewSet.as_view({'get': 'search'}), name='product-search'),
-    path('featured/', views.ProductViewSet.as_view({'get': 'list'}), name='featured-products'),
+    path('', include(router_urls)),
 ]
@@ -1,7 +1,11 @@
 """
 ViewSet для API версии 1
 """
-from django.db.models import Q
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, F, Prefetch, Q, Value
+from django.db.models.functions import Least
+from django.http import HttpResponse
 from main.models import Cart, CartItem, Category, Product
 from main.serializers import (
     CartItemCreateSerializer,
@@ -14,13 +18,69 @@ from main.serializers import (
 )
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from ..common.base import BaseAPIView, BaseViewSet, ReadOnlyViewSet
 from ..filters import CategoryFilter, ProductFilter, SearchFilter
-from ..pagination import StandardPagination
+from ..pagination import (
+    CursorPagination,
+    ProductCursorPagination,
+    StandardPagination,
+)
+from ..renderers import ORJSONRenderer
 from ..versioning import VersionedViewSetMixin
 
+# Поля товара, которые нужны ProductListSerializer (категория
+# подгружается отдельно, см. category_prefetch); description и прочие
+# тяжёлые колонки в списках не читаются
+PRODUCT_LIST_FIELDS = (
+    'id', 'name', 'slug', 'image_url', 'price', 'available', 'category_id',
+)
+
+# Количество доступных товаров категории для CategorySerializer
+CATEGORY_PRODUCTS_COUNT = Count(
+    'products', filter=Q(products__available=True)
+)
+
+# Готовый JSON популярных товаров; сбрасывается сигналами при изменении
+# товаров и категорий (api/signals.py)
+FEATURED_PRODUCTS_CACHE_KEY = 'featured:v1'
+FEATURED_PRODUCTS_LIMIT = 8
+FEATURED_PRODUCTS_CACHE_TIMEOUT = 1800  # 30 минут
+
+# Поиск товаров; на PostgreSQL идет по хранимому search_vector
+PRODUCT_SEARCH_FILTER = SearchFilter(
+    ['name', 'description'],
+    vector_field='search_vector',
+    config=Product.search_config,
+)
+
+
+def category_prefetch(lookup='category'):
+    """
+    Категории товаров вместе с количеством товаров для вложенного
+    CategorySerializer: один запрос на страницу вместо COUNT на строку
+    """
+    return Prefetch(
+        lookup,
+        queryset=Category.objects.only('id', 'name', 'slug').annotate(
+            products_count=CATEGORY_PRODUCTS_COUNT
+        ),
+    )
+
+
+
+def cart_items_prefetch():
+    """Товары корзины с продуктами и категориями для CartSerializer"""
+    return Prefetch(
+        'items',
+        queryset=CartItem.objects.select_related('product').prefetch_related(
+            category_prefetch('product__category')
+        ),
+    )
+
 
 class CategoryViewSet(ReadOnlyViewSet, VersionedViewSetMixin):
     """
@@ -31,12 +91,23 @@ class CategoryViewSet(ReadOnlyViewSet, VersionedViewSetMixin):
     pagination_class = StandardPagination
     filterset_class = CategoryFilter
     select_related_fields = []
-    prefetch_related_fields = ['products']
+    prefetch_related_fields = []
     lookup_field = 'slug'
     
     # Теги для документации
     swagger_schema_tags = ['categories']
     
+    def get_queryset(self):
+        """Количество товаров считается одним запросом вместе с категориями"""
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Запрос с GROUP BY теряет Meta.ordering - порядок задается
+            # явно, иначе страницы списка идут в произвольном порядке
+            queryset = queryset.annotate(
+                products_count=CATEGORY_PRODUCTS_COUNT
+            ).order_by(*Category._meta.ordering)
+        return queryset
+    
     @action(detail=True, methods=['get'])
     def products(self, request, slug=None):
         """Получение товаров конкретной категории"""
@@ -44,20 +115,19 @@ class CategoryViewSet(ReadOnlyViewSet, VersionedViewSetMixin):
         products = Product.objects.filter(
             category=category, 
             available=True
-        ).select_related('category')
+        ).prefetch_related(category_prefetch()).only(*PRODUCT_LIST_FIELDS)
         
-        # Применяем фильтры
-        filter_params = request.query_params.dict()
-        if filter_params:
-            product_filter = ProductFilter(data=filter_params, queryset=products)
-            products = product_filter.qs
+        # Применяем фильтры товаров прямо к QueryDict, без копирования
+        # параметров; фильтры без значений queryset не клонируют
+        products = ProductFilter(
+            data=request.query_params, queryset=products
+        ).qs
         
         # Пагинация
-        paginator = self.pagination_class()
-        result_page = paginator.paginate_queryset(products, request)
+        result_page = self.paginate_queryset(products)
         
         serializer = ProductListSerializer(result_page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
 
 class ProductViewSet(ReadOnlyViewSet, VersionedViewSetMixin):
@@ -66,9 +136,9 @@ class ProductViewSet(ReadOnlyViewSet, VersionedViewSetMixin):
     """
     queryset = Product.objects.filter(available=True)
     serializer_class = ProductSerializer
-    pagination_class = StandardPagination
+    pagination_class = ProductCursorPagination
     filterset_class = ProductFilter
-    select_related_fields = ['category']
+    select_related_fields = []
     prefetch_related_fields = []
     lookup_field = 'slug'
     
@@ -77,13 +147,18 @@ class ProductViewSet(ReadOnlyViewSet, VersionedViewSetMixin):
     
     def get_queryset(self):
         """Получение queryset с оптимизацией"""
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().prefetch_related(
+            category_prefetch()
+        )
         
         # Поиск
         search_term = self.request.query_params.get('search')
         if search_term:
-            search_filter = SearchFilter(['name', 'description'])
-            queryset = search_filter.filter(queryset, search_term)
+            queryset = PRODUCT_SEARCH_FILTER.filter(queryset, search_term)
+        
+        # Списочным действиям не нужны полные строки товаров
+        if self.action in ('list', 'search'):
+            queryset = queryset.only(*PRODUCT_LIST_FIELDS)
         
         return queryset
     
@@ -105,8 +180,7 @@ class ProductViewSet(ReadOnlyViewSet, VersionedViewSetMixin):
         
         # Поиск по тексту
         if search_term:
-            search_filter = SearchFilter(['name', 'description'])
-            queryset = search_filter.filter(queryset, search_term)
+            queryset = PRODUCT_SEARCH_FILTER.filter(queryset, search_term)
         
         # Фильтр по категории
         if category_id:
@@ -128,14 +202,44 @@ class ProductViewSet(ReadOnlyViewSet, VersionedViewSetMixin):
     @action(detail=True, methods=['get'])
     def related(self, request, slug=None):
         """Получение связанных товаров"""
-        product = self.get_object()
+        # Из самого товара нужна только категория, полная строка не читается
+        category_id = self.queryset.filter(slug=slug).values_list(
+            'category_id', flat=True
+        ).first()
+        if category_id is None:
+            raise NotFound()
+        
         related_products = Product.objects.filter(
-            category=product.category,
+            category_id=category_id,
             available=True
-        ).exclude(id=product.id)[:4]
+        ).exclude(slug=slug).prefetch_related(category_prefetch()).only(
+            *PRODUCT_LIST_FIELDS
+        ).order_by('-id')[:4]
         
         serializer = ProductListSerializer(related_products, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def featured(self, request):
+        """
+        Популярные (новые) товары: в кэше хранится уже отрендеренный JSON,
+        поэтому при попадании ни сериализатор, ни рендерер DRF не работают
+        """
+        content = cache.get(FEATURED_PRODUCTS_CACHE_KEY)
+        if content is None:
+            products = self.queryset.prefetch_related(
+                category_prefetch()
+            ).only(*PRODUCT_LIST_FIELDS).order_by('-created')[:FEATURED_PRODUCTS_LIMIT]
+            # Без request в контексте: ссылки на изображения относительные
+            # и не зависят от хоста, с которого пришел первый запрос
+            serializer = ProductListSerializer(products, many=True)
+            content = ORJSONRenderer().render(serializer.data)
+            cache.set(
+                FEATURED_PRODUCTS_CACHE_KEY,
+                content,
+                FEATURED_PRODUCTS_CACHE_TIMEOUT,
+            )
+        return HttpResponse(content, content_type='application/json')
 
 
 class CartViewSet(BaseViewSet, VersionedViewSetMixin):
@@ -143,23 +247,40 @@ class CartViewSet(BaseViewSet, VersionedViewSetMixin):
     ViewSet для корзины
     """
     serializer_class = CartSerializer
-    pagination_class = StandardPagination
+    pagination_class = CursorPagination
+    permission_classes = [IsAuthenticated]
     select_related_fields = ['user']
-    prefetch_related_fields = ['items__product', 'items__product__category']
+    prefetch_related_fields = []
     
     # Теги для документации
     swagger_schema_tags = ['carts']
     
     def get_queryset(self):
         """Получение корзин только для текущего пользователя"""
-        if self.request.user.is_authenticated:
-            return Cart.objects.filter(user=self.request.user)
-        return Cart.objects.none()
+        # Анонимные запросы отсекает IsAuthenticated до обращения к queryset
+        queryset = Cart.objects.filter(user=self.request.user)
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related(cart_items_prefetch())
+        elif self.action == 'summary':
+            # Количество и стоимость хранятся в строке корзины (их ведут
+            # триггеры БД); отдельно считается только число позиций
+            queryset = queryset.annotate(lines_count=Count('items'))
+        return queryset
     
     def perform_create(self, serializer):
         """Создание корзины для текущего пользователя"""
         serializer.save(user=self.request.user)
     
+    def get_cart_with_items(self, cart):
+        """
+        Повторная загрузка корзины после изменения товаров: товары с
+        продуктами и категории приходят фиксированным числом запросов
+        вместо запроса на каждый товар при сериализации
+        """
+        return Cart.objects.select_related('user').prefetch_related(
+            cart_items_prefetch()
+        ).get(pk=cart.pk)
+    
     @action(detail=True, methods=['post'])
     def add_item(self, request, pk=None):
         """Добавление товара в корзину"""
@@ -170,9 +291,10 @@ class CartViewSet(BaseViewSet, VersionedViewSetMixin):
             product_id = serializer.validated_data['product_id']
             quantity = serializer.validated_data['quantity']
             
-            try:
-                product = Product.objects.get(id=product_id, available=True)
-            except Product.DoesNotExist:
+            product_exists = Product.objects.filter(
+                id=product_id, available=True
+            ).exists()
+            if not product_exists:
                 return Response(
                     {'error': 'Товар не найден или недоступен'}, 
                     status=status.HTTP_404_NOT_FOUND
@@ -181,18 +303,18 @@ class CartViewSet(BaseViewSet, VersionedViewSetMixin):
             # Проверяем, есть ли уже такой товар в корзине
             cart_item, created = CartItem.objects.get_or_create(
                 cart=cart,
-                product=product,
+                product_id=product_id,
                 defaults={'quantity': quantity}
             )
             
             if not created:
-                cart_item.quantity += quantity
-                if cart_item.quantity > 99:
-                    cart_item.quantity = 99
-                cart_item.save()
+                # Атомарное увеличение в БД: без гонки между запросами
+                CartItem.objects.filter(pk=cart_item.pk).update(
+                    quantity=Least(F('quantity') + quantity, Value(99))
+                )
             
             # Возвращаем обновленную корзину
-            cart_serializer = CartSerializer(cart)
+            cart_serializer = CartSerializer(self.get_cart_with_items(cart))
             return Response(cart_serializer.data)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -203,7 +325,7 @@ class CartViewSet(BaseViewSet, VersionedViewSetMixin):
         cart = self.get_object()
         cart.items.all().delete()
         
-        cart_serializer = CartSerializer(cart)
+        cart_serializer = CartSerializer(self.get_cart_with_items(cart))
         return Response(cart_serializer.data)
     
     @action(detail=True, methods=['get'])
@@ -211,9 +333,9 @@ class CartViewSet(BaseViewSet, VersionedViewSetMixin):
         """Получение сводки корзины"""
         cart = self.get_object()
         return Response({
-            'total_items': cart.total_items,
-            'total_price': cart.total_price,
-            'items_count': cart.items.count()
+            'total_items': cart.items_count,
+            'total_price': cart.subtotal,
+            'items_count': cart.lines_count
         })
 
 
@@ -222,18 +344,34 @@ class CartItemViewSet(BaseViewSet, VersionedViewSetMixin):
     ViewSet для товаров в корзине
     """
     serializer_class = CartItemSerializer
-    pagination_class = StandardPagination
+    pagination_class = CursorPagination
+    permission_classes = [IsAuthenticated]
     select_related_fields = ['cart', 'product']
-    prefetch_related_fields = ['product__category']
+    prefetch_related_fields = []
     
     # Теги для документации
     swagger_schema_tags = ['cart-items']
     
     def get_queryset(self):
         """Получение товаров корзины только для текущего пользователя"""
-        if self.request.user.is_authenticated:
-            return CartItem.objects.filter(cart__user=self.request.user)
-        return CartItem.objects.none()
+        # Товар нужен сериализатору - одним JOIN вместо запросов на
+        # каждую строку
+        queryset = CartItem.objects.filter(
+            cart__user=self.request.user
+        ).select_related('cart', 'product')
+        if self.action not in ('increment', 'decrement', 'destroy'):
+            # Категории (с количеством товаров) - одним запросом; действиям,
+            # которые не сериализуют товар, они не нужны
+            queryset = queryset.prefetch_related(
+                category_prefetch('product__category')
+            )
+        if self.action == 'list':
+            # Сумма строки считается в БД; список не изменяет товары,
+            # поэтому аннотация не устареет до сериализации
+            queryset = queryset.annotate(
+                line_total=F('quantity') * F('product__price')
+            )
+        return queryset
     
     def perform_update(self, serializer):
         """Обновление товара в корзине"""
@@ -250,27 +388,28 @@ class CartItemViewSet(BaseViewSet, VersionedViewSetMixin):
     def increment(self, request, pk=None):
         """Увеличение количества товара"""
         cart_item = self.get_object()
-        cart_item.quantity += 1
-        if cart_item.quantity > 99:
-            cart_item.quantity = 99
-        cart_item.save()
+        # Новое количество возвращает сам UPDATE, без повторного SELECT
+        quantity = CartItem.change_quantity(cart_item.cart_id, cart_item.pk, 1)
+        if quantity is None:
+            # Позицию удалили параллельным запросом
+            raise NotFound()
         
-        serializer = CartItemSerializer(cart_item)
-        return Response(serializer.data)
+        # Изменилось только количество, остальное у клиента уже есть
+        return Response({'quantity': quantity})
     
     @action(detail=True, methods=['post'])
     def decrement(self, request, pk=None):
         """Уменьшение количества товара"""
         cart_item = self.get_object()
-        cart_item.quantity -= 1
         
-        if cart_item.quantity < 1:
+        # Уменьшаем только пока количество больше 1, иначе удаляем
+        quantity = CartItem.change_quantity(cart_item.cart_id, cart_item.pk, -1)
+        
+        if quantity is None:
             cart_item.delete()
             return Response({'message': 'Товар удален из корзины'})
         
-        cart_item.save()
-        serializer = CartItemSerializer(cart_item)
-        return Response(serializer.data)
+        return Response({'quantity': quantity})
 
 
 class UserProfileViewSet(ReadOnlyViewSet, VersionedViewSetMixin):
@@ -279,18 +418,18 @@ class UserProfileViewSet(ReadOnlyViewSet, VersionedViewSetMixin):
     """
     serializer_class = UserProfileSerializer
     pagination_class = StandardPagination
+    permission_classes = [IsAuthenticated]
     select_related_fields = []
-    prefetch_related_fields = ['cart_set']
+    prefetch_related_fields = []
     
     # Теги для документации
     swagger_schema_tags = ['profile']
     
     def get_queryset(self):
         """Получение профиля только для текущего пользователя"""
-        if self.request.user.is_authenticated:
-            from django.contrib.auth.models import User
-            return User.objects.filter(id=self.request.user.id)
-        return User.objects.none()
+        return User.objects.filter(id=self.request.user.id).annotate(
+            carts_count=Count('cart')
+        )
     
     @action(detail=False, methods=['get'])
     def me(self, request):
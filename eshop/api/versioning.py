@@ -5,13 +5,16 @@ from django.conf import settings
 from rest_framework.settings import api_settings
 from rest_framework.versioning import URLPathVersioning
 
+# Множество для проверки версии за O(1)
+ALLOWED_VERSIONS = frozenset(('v1', 'v2'))
+
 
 class APIVersioning(URLPathVersioning):
     """
     Кастомная система версионирования API
     """
     default_version = 'v1'
-    allowed_versions = ['v1', 'v2']
+    allowed_versions = ALLOWED_VERSIONS
     version_param = 'version'
     
     def get_default_version(self, request):
@@ -31,30 +34,34 @@ class VersionedViewSetMixin:
     """
     Миксин для ViewSet с поддержкой версионирования
     """
+    _has_serializer_class_v2 = False
+    _has_queryset_v2 = False
+    _has_permission_classes_v2 = False
+    
+    def __init_subclass__(cls, **kwargs):
+        """Наличие v2-вариантов определяется один раз при создании класса"""
+        super().__init_subclass__(**kwargs)
+        cls._has_serializer_class_v2 = hasattr(cls, 'serializer_class_v2')
+        cls._has_queryset_v2 = hasattr(cls, 'queryset_v2')
+        cls._has_permission_classes_v2 = hasattr(cls, 'permission_classes_v2')
     
     def get_serializer_class(self):
         """Выбор сериализатора в зависимости от версии"""
-        version = self.request.version
-        
-        if version == 'v2' and hasattr(self, 'serializer_class_v2'):
+        if self._has_serializer_class_v2 and self.request.version == 'v2':
             return self.serializer_class_v2
         
         return super().get_serializer_class()
     
     def get_queryset(self):
         """Выбор queryset в зависимости от версии"""
-        version = self.request.version
-        
-        if version == 'v2' and hasattr(self, 'queryset_v2'):
+        if self._has_queryset_v2 and self.request.version == 'v2':
             return self.queryset_v2
         
         return super().get_queryset()
     
     def get_permissions(self):
         """Выбор разрешений в зависимости от версии"""
-        version = self.request.version
-        
-        if version == 'v2' and hasattr(self, 'permission_classes_v2'):
+        if self._has_permission_classes_v2 and self.request.version == 'v2':
             return [permission() for permission in self.permission_classes_v2]
         
         return super().get_permissions()
@@ -62,11 +69,10 @@ class VersionedViewSetMixin:
 
 def get_api_version(request):
     """Получение версии API из запроса"""
-    versioning = APIVersioning()
-    return versioning.get_version_param(request)
+    # Версию уже определил DRF при разборе запроса
+    return getattr(request, 'version', None) or APIVersioning.default_version
 
 
 def is_api_version_supported(version):
     """Проверка поддержки версии API"""
-    versioning = APIVersioning()
-    return versioning.is_allowed_version(version)
+    return version in ALLOWED_VERSIONS
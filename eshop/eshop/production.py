@@ -36,6 +36,9 @@ CACHES = {
             'CONNECTION_POOL_KWARGS': {
                 'max_connections': 50,
             },
+            'SOCKET_CONNECT_TIMEOUT': 1,
+            'SOCKET_TIMEOUT': 1,
+            'IGNORE_EXCEPTIONS': True,
         },
         'KEY_PREFIX': 'eshop_prod',
         'TIMEOUT': 300,
@@ -44,12 +47,30 @@ CACHES = {
 
 # Настройки статических файлов
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# collectstatic создает .gz и (при установленном brotli) .br версии файлов,
+# WhiteNoise отдает подходящую по Accept-Encoding
+STORAGES = {
+    **STORAGES,
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+_security_index = MIDDLEWARE.index(
+    'django.middleware.security.SecurityMiddleware'
+)
+MIDDLEWARE = [
+    *MIDDLEWARE[:_security_index + 1],
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    *MIDDLEWARE[_security_index + 1:],
+]
 
 # Настройки медиа файлов
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # Настройки логирования
+# Логи пишутся через очередь: запрос только кладет запись в LOG_QUEUE,
+# запись в файл и консоль выполняет QueueListener (см. main.log_queue).
+# При gunicorn --preload слушатель перезапускается в каждом воркере после fork
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -64,11 +85,17 @@ LOGGING = {
         },
     },
     'handlers': {
+        'queue': {
+            'level': 'INFO',
+            'class': 'logging.handlers.QueueHandler',
+            'queue': 'ext://main.log_queue.LOG_QUEUE',
+        },
         'file': {
             'level': 'INFO',
             'class': 'logging.FileHandler',
             'filename': os.path.join(BASE_DIR, 'logs', 'django.log'),
             'formatter': 'verbose',
+            'delay': True,
         },
         'console': {
             'level': 'INFO',
@@ -78,18 +105,21 @@ LOGGING = {
     },
     'loggers': {
         'django': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'main': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
     },
 }
 
+# Обработчики, которые QueueListener запускает в фоновом потоке
+LOG_QUEUE_HANDLERS = ['file', 'console']
+
 # Создаем директорию для логов
 os.makedirs(os.path.join(BASE_DIR, 'logs'), exist_ok=True)
 
@@ -102,15 +132,43 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', ''),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Постоянные соединения: без установки TCP/TLS/auth на каждый запрос
+        'CONN_MAX_AGE': 600,  # 10 минут
+        # Проверка соединения перед повторным использованием вместо
+        # ошибки на "протухшем" сокете
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
-            'CONN_MAX_AGE': 600,  # 10 минут
-            'OPTIONS': {
-                'sslmode': 'require',
-            },
+            'sslmode': 'require',
         },
     }
 }
 
+# Встроенный пул соединений psycopg 3 (Django 5.1+); с пулом постоянные
+# соединения Django должны быть отключены
+if os.environ.get('DB_POOL', 'False').lower() == 'true':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 4)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+    }
+
+# При работе через PgBouncer в режиме transaction pooling серверные
+# курсоры не переживают смену соединения - отключаем их
+if os.environ.get('DB_PGBOUNCER', 'False').lower() == 'true':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+# API отдает и принимает только JSON: без BrowsableAPIRenderer и разбора
+# форм согласование формата сводится к единственному варианту
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser',
+    ],
+}
+
 # Настройки email
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
@@ -137,7 +195,6 @@ CACHE_MIDDLEWARE_KEY_PREFIX = 'eshop_prod'
 CACHE_MIDDLEWARE_ALIAS = 'default'
 
 # Настройки для оптимизации
-CONN_MAX_AGE = 600
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
@@ -29,6 +29,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Сжатие ответов (JSON API, HTML); первым в списке, чтобы обрабатывать
+    # уже готовый ответ. Добавляет Vary: Accept-Encoding
+    'django.middleware.gzip.GZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,10 +65,17 @@ TEMPLATES = [
 WSGI_APPLICATION = 'eshop.wsgi.application'
 
 
+# Поддерживаются только SQLite и PostgreSQL: итоги корзины считают
+# триггеры БД (миграция main.0010, проверка main.E001)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Файловая тестовая БД, чтобы pytest --reuse-db / test --keepdb
+        # могли переиспользовать схему между запусками
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -97,13 +107,43 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 # Кэширование
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 300,  # 5 минут по умолчанию
+# Если задан REDIS_URL, кэш общий для всех воркеров (Redis), иначе -
+# локальная память процесса (разработка и тесты)
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'CONNECTION_POOL_KWARGS': {
+                    'max_connections': 100,
+                },
+                'SOCKET_CONNECT_TIMEOUT': 1,
+                'SOCKET_TIMEOUT': 1,
+                # Недоступный Redis означает промах кэша, а не ошибку 500
+                'IGNORE_EXCEPTIONS': True,
+            },
+            'TIMEOUT': 300,  # 5 минут по умолчанию
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+            'TIMEOUT': 300,  # 5 минут по умолчанию
+        }
+    }
+
+DJANGO_REDIS_IGNORE_EXCEPTIONS = True
+DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS = True
+
+# Отложенная запись добавлений в корзину через Redis (main/cart_buffer.py);
+# требует REDIS_URL и периодического запуска flush_cart_buffer
+CART_WRITE_BEHIND = bool(REDIS_URL) and os.environ.get('CART_WRITE_BEHIND') == '1'
 
 # Настройки для оптимизации
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
@@ -113,8 +153,16 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 SESSION_COOKIE_AGE = 1209600  # 2 недели
 SESSION_SAVE_EVERY_REQUEST = False
 
-# Настройки статических файлов
-STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+# Настройки статических файлов (в разработке - без сжатия при collectstatic).
+# Django 5.1+ читает хранилища только из STORAGES
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
 
 # Настройки медиа файлов
 MEDIA_URL = 'media/'
@@ -131,16 +179,23 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Пагинация по курсору (по индексу created): без COUNT(*) и OFFSET
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CursorPagination',
     'PAGE_SIZE': 12,
     'DEFAULT_FILTER_BACKENDS': [
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # JSON рендерится и разбирается через orjson (api/renderers.py)
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
         'rest_framework.throttling.UserRateThrottle'
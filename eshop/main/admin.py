@@ -20,10 +20,13 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'session_key', 'total_price', 'total_items', 'created', 'updated']
+    # Итоги хранятся в строке корзины (их ведут триггеры БД)
+    list_display = ['id', 'user', 'session_key', 'subtotal', 'items_count', 'created', 'updated']
     list_filter = ['created', 'updated']
-    readonly_fields = ['total_price', 'total_items']
+    readonly_fields = ['subtotal', 'items_count']
     search_fields = ['user__username', 'session_key']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
 
 
 @admin.register(CartItem)
@@ -32,3 +35,5 @@ class CartItemAdmin(admin.ModelAdmin):
     list_filter = ['created', 'updated']
     readonly_fields = ['total_price']
     search_fields = ['product__name', 'cart__user__username']
+    list_select_related = ['cart', 'cart__user', 'product']
+    raw_id_fields = ['cart', 'product']
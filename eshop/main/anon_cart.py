@@ -0,0 +1,153 @@
+"""
+Корзина анонимного пользователя в подписанной cookie
+
+Товары анонимного пользователя хранятся в cookie как {id товара: количество},
+подписанной TimestampSigner (request.get_signed_cookie). Строки Cart/CartItem
+в БД не создаются; при первом обращении к корзине после входа товары
+переносятся в корзину пользователя.
+"""
+import json
+from dataclasses import dataclass, field
+from functools import wraps
+
+from django.conf import settings
+
+from .models import CartItem, Product
+
+COOKIE_NAME = 'cart'
+COOKIE_SALT = 'main.anon_cart'
+# Ограничение числа позиций: cookie не должна превышать ~4 КБ
+MAX_ITEMS = 100
+
+
+@dataclass
+class AnonCartItem:
+    """Позиция анонимной корзины (интерфейс шаблона как у CartItem)"""
+    product: Product
+    quantity: int
+
+    @property
+    def id(self):
+        # Позиция анонимной корзины адресуется id товара
+        return self.product.id
+
+    @property
+    def total_price(self):
+        return self.quantity * self.product.price
+
+
+@dataclass
+class AnonCart:
+    """Корзина анонимного пользователя"""
+    items: dict = field(default_factory=dict)
+    modified: bool = False
+
+    @classmethod
+    def from_request(cls, request):
+        """Корзина из cookie запроса (читается один раз за запрос)"""
+        anon_cart = getattr(request, 'anon_cart', None)
+        if anon_cart is None:
+            anon_cart = cls(cls._load(request))
+            request.anon_cart = anon_cart
+        return anon_cart
+
+    @staticmethod
+    def _load(request):
+        value = request.get_signed_cookie(
+            COOKIE_NAME,
+            default=None,
+            salt=COOKIE_SALT,
+            max_age=settings.SESSION_COOKIE_AGE,
+        )
+        if not value:
+            return {}
+        try:
+            items = {
+                int(product_id): min(int(quantity), CartItem.max_quantity)
+                for product_id, quantity in json.loads(value).items()
+            }
+        except (AttributeError, TypeError, ValueError):
+            return {}
+        return {
+            product_id: quantity
+            for product_id, quantity in items.items() if quantity > 0
+        }
+
+    @property
+    def total_items(self):
+        return sum(self.items.values())
+
+    def add(self, product_id, quantity):
+        """Добавление товара; None, если корзина заполнена"""
+        if product_id not in self.items and len(self.items) >= MAX_ITEMS:
+            return None
+        new_quantity = min(
+            self.items.get(product_id, 0) + quantity, CartItem.max_quantity
+        )
+        self.items[product_id] = new_quantity
+        self.modified = True
+        return new_quantity
+
+    def set_quantity(self, product_id, quantity):
+        """Новое количество товара; False, если товара нет в корзине"""
+        if product_id not in self.items:
+            return False
+        self.items[product_id] = min(quantity, CartItem.max_quantity)
+        self.modified = True
+        return True
+
+    def remove(self, product_id):
+        """Удаление товара; False, если товара нет в корзине"""
+        if self.items.pop(product_id, None) is None:
+            return False
+        self.modified = True
+        return True
+
+    def clear(self):
+        self.items = {}
+        self.modified = True
+
+    def get_items(self):
+        """Позиции с товарами (один запрос; пустая корзина - без запросов)"""
+        if not self.items:
+            return []
+        products = Product.objects.select_related('category').only(
+            *Product.cart_fields
+        ).filter(id__in=self.items, available=True).order_by('name')
+        return [
+            AnonCartItem(product, self.items[product.id]) for product in products
+        ]
+
+    def merge_into(self, cart_id):
+        """Перенос товаров в корзину пользователя в БД"""
+        for product_id, quantity in self.items.items():
+            CartItem.add_quantity(cart_id, product_id, quantity)
+        self.clear()
+
+    def save(self, response):
+        """Запись cookie в ответ, если корзина изменилась"""
+        if not self.modified:
+            return
+        if self.items:
+            response.set_signed_cookie(
+                COOKIE_NAME,
+                json.dumps(self.items, separators=(',', ':')),
+                salt=COOKIE_SALT,
+                max_age=settings.SESSION_COOKIE_AGE,
+                httponly=True,
+                samesite='Lax',
+            )
+        else:
+            response.delete_cookie(COOKIE_NAME, samesite='Lax')
+
+
+def save_anon_cart(view_func):
+    """Декоратор представления: сохраняет измененную анонимную корзину в cookie"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        response = view_func(request, *args, **kwargs)
+        anon_cart = getattr(request, 'anon_cart', None)
+        if anon_cart is not None:
+            anon_cart.save(response)
+        return response
+    return wrapper
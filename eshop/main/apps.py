@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        import main.checks  # noqa
+        import main.signals  # noqa
+
+        # Фоновая запись логов (включается в production через LOG_QUEUE_HANDLERS)
+        handler_names = getattr(settings, 'LOG_QUEUE_HANDLERS', None)
+        if handler_names:
+            from .log_queue import start_listener
+            start_listener(handler_names)
@@ -0,0 +1,164 @@
+"""
+Отложенная запись добавлений в корзину через Redis (write-behind)
+
+Добавление товара увеличивает счетчик в хэше Redis и отмечает корзину
+как "грязную"; в БД изменения переносит команда flush_cart_buffer.
+Перед чтением или другим изменением корзины ее буфер сбрасывается
+в БД синхронно, поэтому пользователь всегда видит свои добавления.
+Работает только с кэшем django-redis и CART_WRITE_BEHIND = True,
+иначе (и при недоступном Redis) добавление пишется в БД сразу.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+DIRTY_CARTS_KEY = 'cart:dirty'
+
+
+def _delta_key(cart_id):
+    return f'cart:{cart_id}:delta'
+
+
+def get_redis():
+    """Клиент Redis из кэша django-redis или None, если буфер выключен"""
+    if not getattr(settings, 'CART_WRITE_BEHIND', False):
+        return None
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        # django-redis не установлен или кэш не Redis
+        return None
+
+
+def is_enabled():
+    return get_redis() is not None
+
+
+def buffer_add(cart_id, product_id, quantity):
+    """
+    Запись добавления в буфер: HINCRBY + ZADD одним конвейером.
+    Возвращает False, если буфер недоступен (запись нужно сделать в БД).
+    """
+    client = get_redis()
+    if client is None:
+        return False
+
+    from redis.exceptions import RedisError
+    try:
+        pipe = client.pipeline()
+        pipe.hincrby(_delta_key(cart_id), product_id, quantity)
+        pipe.zadd(DIRTY_CARTS_KEY, {cart_id: time.time()})
+        pipe.execute()
+    except RedisError:
+        logger.warning('Буфер корзины недоступен, запись в БД', exc_info=True)
+        return False
+    return True
+
+
+def get_pending_quantity(cart_id):
+    """Количество товаров, добавленных в корзину, но еще не записанных в БД"""
+    client = get_redis()
+    if client is None:
+        return 0
+
+    from redis.exceptions import RedisError
+    try:
+        values = client.hvals(_delta_key(cart_id))
+    except RedisError:
+        logger.warning('Буфер корзины недоступен', exc_info=True)
+        return 0
+    return sum(int(value) for value in values)
+
+
+def _take_delta(client, cart_id):
+    """Атомарное чтение и удаление буфера корзины"""
+    pipe = client.pipeline()
+    pipe.hgetall(_delta_key(cart_id))
+    pipe.delete(_delta_key(cart_id))
+    pipe.zrem(DIRTY_CARTS_KEY, cart_id)
+    delta = pipe.execute()[0]
+    return {int(product_id): int(quantity) for product_id, quantity in delta.items()}
+
+
+def _restore_delta(client, cart_id, delta):
+    """Возврат буфера корзины в Redis (запись в БД не удалась)"""
+    pipe = client.pipeline()
+    for product_id, quantity in delta.items():
+        pipe.hincrby(_delta_key(cart_id), product_id, quantity)
+    pipe.zadd(DIRTY_CARTS_KEY, {cart_id: time.time()})
+    pipe.execute()
+
+
+def flush_cart(cart_id):
+    """
+    Перенос буфера одной корзины в БД; возвращает число позиций.
+    Все позиции пишутся в одной транзакции; если запись не удалась,
+    буфер возвращается в Redis и будет перенесен следующим сбросом.
+    """
+    client = get_redis()
+    if client is None:
+        return 0
+
+    from redis.exceptions import RedisError
+
+    from .models import CartItem
+
+    try:
+        delta = _take_delta(client, cart_id)
+    except RedisError:
+        # Без Redis корзина читается из БД без отложенных добавлений
+        logger.warning('Буфер корзины недоступен', exc_info=True)
+        return 0
+    if not delta:
+        return 0
+
+    try:
+        with transaction.atomic():
+            for product_id, quantity in delta.items():
+                # Недоступные или удаленные товары upsert просто пропускает
+                CartItem.add_quantity(cart_id, product_id, quantity)
+    except Exception:
+        try:
+            _restore_delta(client, cart_id, delta)
+        except RedisError:
+            logger.error(
+                'Буфер корзины %s потерян: %s', cart_id, delta, exc_info=True
+            )
+        raise
+    return len(delta)
+
+
+def discard_cart(cart_id):
+    """Удаление буфера корзины без записи в БД (очистка корзины)"""
+    client = get_redis()
+    if client is None:
+        return
+
+    from redis.exceptions import RedisError
+    try:
+        _take_delta(client, cart_id)
+    except RedisError:
+        logger.warning('Буфер корзины недоступен', exc_info=True)
+
+
+def flush_dirty(limit=500):
+    """Перенос в БД буферов "грязных" корзин, самые старые - первыми"""
+    client = get_redis()
+    if client is None:
+        return 0
+
+    flushed = 0
+    for cart_id in client.zrange(DIRTY_CARTS_KEY, 0, limit - 1):
+        try:
+            flush_cart(int(cart_id))
+        except Exception:
+            # Буфер корзины возвращен в Redis, остальные корзины сбрасываются
+            logger.exception('Не удалось перенести буфер корзины %s', cart_id)
+            continue
+        flushed += 1
+    return flushed
@@ -0,0 +1,29 @@
+"""
+Системные проверки приложения main
+"""
+from django.core.checks import Error, register
+from django.db import connections
+
+# Итоги корзины (Cart.items_count, Cart.subtotal) поддерживают триггеры
+# миграции 0010, написанные для этих СУБД
+CART_TOTALS_VENDORS = ('postgresql', 'sqlite')
+
+
+@register()
+def check_database_vendor(app_configs, **kwargs):
+    """Все базы данных проекта должны поддерживать триггеры итогов корзины"""
+    errors = []
+    for alias in connections:
+        vendor = connections[alias].vendor
+        if vendor not in CART_TOTALS_VENDORS:
+            errors.append(
+                Error(
+                    f'СУБД {vendor} (база "{alias}") не поддерживается: '
+                    'итоги корзины поддерживаются триггерами миграции '
+                    'main.0010_cart_totals только для PostgreSQL и SQLite',
+                    hint='Используйте PostgreSQL (production) или SQLite '
+                    '(разработка)',
+                    id='main.E001',
+                )
+            )
+    return errors
@@ -0,0 +1,70 @@
+"""
+Фоновая запись логов: QueueHandler в потоке запроса, QueueListener в отдельном потоке
+"""
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Очередь записей лога: в обработчике запроса остается только put()
+LOG_QUEUE = queue.Queue(-1)
+
+_listener = None
+_handler_names = None
+
+
+def _get_handler(name):
+    """Обработчик, созданный dictConfig, по имени из LOGGING"""
+    get_handler = getattr(logging, 'getHandlerByName', None)
+    if get_handler is not None:
+        return get_handler(name)
+    return logging._handlers.get(name)
+
+
+def start_listener(handler_names):
+    """Запуск QueueListener с реальными обработчиками (однократно на процесс)"""
+    global _listener, _handler_names
+    if _listener is not None:
+        return _listener
+
+    handlers = [h for h in map(_get_handler, handler_names) if h is not None]
+    if not handlers:
+        return None
+
+    _handler_names = handler_names
+    _listener = QueueListener(LOG_QUEUE, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def _stop_listener():
+    """При остановке процесса дописываем оставшиеся в очереди записи"""
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener_after_fork():
+    """
+    Поток слушателя не наследуется дочерним процессом: если процесс
+    форкнут после запуска (gunicorn --preload), в воркере запускается
+    свой слушатель. Очередь тоже новая - ее замки мог держать поток
+    родителя в момент fork.
+    """
+    global _listener, LOG_QUEUE
+    if _listener is None:
+        return
+
+    old_queue = LOG_QUEUE
+    LOG_QUEUE = queue.Queue(-1)
+    for handler in list(logging._handlers.values()):
+        if isinstance(handler, QueueHandler) and handler.queue is old_queue:
+            handler.queue = LOG_QUEUE
+
+    _listener = None
+    start_listener(_handler_names)
+
+
+atexit.register(_stop_listener)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
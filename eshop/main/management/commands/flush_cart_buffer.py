@@ -0,0 +1,38 @@
+"""
+Команда переноса отложенных добавлений в корзину из Redis в БД
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from main import cart_buffer
+
+
+class Command(BaseCommand):
+    help = 'Перенос буфера корзин (Redis) в базу данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять каждые N секунд (0 - однократно)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='Максимум корзин за один проход',
+        )
+
+    def handle(self, *args, **options):
+        if not cart_buffer.is_enabled():
+            self.stdout.write('⚠️ Буфер корзин выключен (нужны Redis и CART_WRITE_BEHIND)')
+            return
+
+        while True:
+            flushed = cart_buffer.flush_dirty(options['limit'])
+            if flushed:
+                self.stdout.write(f'✅ Перенесено корзин: {flushed}')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
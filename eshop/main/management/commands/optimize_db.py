@@ -52,29 +52,47 @@ class Command(BaseCommand):
         self.stdout.write('📊 Анализируем таблицы...')
         
         with connection.cursor() as cursor:
-            # Анализируем размеры таблиц
-            cursor.execute("""
-                SELECT name, sql FROM sqlite_master 
-                WHERE type='table' AND name NOT LIKE 'sqlite_%'
-            """)
+            # Обновляем статистику планировщика и читаем из нее оценки
+            # числа строк - без COUNT(*) с полным сканированием таблиц
+            cursor.execute('ANALYZE')
+            row_counts = self.get_row_estimates(cursor)
             
-            tables = cursor.fetchall()
-            
-            for table_name, table_sql in tables:
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-                count = cursor.fetchone()[0]
-                
-                self.stdout.write(f'📋 Таблица {table_name}: {count} записей')
+            introspection = connection.introspection
+            for table_name in introspection.table_names(cursor):
+                count = row_counts.get(table_name, 0)
+                self.stdout.write(f'📋 Таблица {table_name}: ~{count} записей')
                 
                 # Анализируем индексы
-                cursor.execute(f"PRAGMA index_list({table_name})")
-                indexes = cursor.fetchall()
+                constraints = introspection.get_constraints(cursor, table_name)
+                indexes = [
+                    name for name, info in constraints.items()
+                    if info['index'] or info['unique']
+                ]
                 
                 if indexes:
                     self.stdout.write(f'   🔍 Индексы: {len(indexes)}')
                 else:
                     self.stdout.write(f'   ⚠️  Индексы отсутствуют')
 
+    def get_row_estimates(self, cursor):
+        """Оценка числа строк по таблицам из статистики СУБД"""
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT relname, n_live_tup FROM pg_stat_user_tables'
+            )
+            return dict(cursor.fetchall())
+        
+        if connection.vendor == 'sqlite':
+            # Первое число в stat - количество строк в таблице (индексе)
+            cursor.execute('SELECT tbl, stat FROM sqlite_stat1')
+            estimates = {}
+            for table_name, stat in cursor.fetchall():
+                count = int(stat.split()[0])
+                estimates[table_name] = max(estimates.get(table_name, 0), count)
+            return estimates
+        
+        return {}
+
     def vacuum_database(self):
         """Выполнение VACUUM для SQLite"""
         self.stdout.write('🧹 Выполняем VACUUM...')
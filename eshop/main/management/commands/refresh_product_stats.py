@@ -0,0 +1,39 @@
+"""
+Команда пересчета материализованного представления статистики товаров
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from main.utils import refresh_product_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчет статистики товаров (main_product_stats), если она устарела'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять каждые N секунд (0 - однократно)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересчитать, даже если изменений не было',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write('⚠️ Статистика хранится в представлении только на PostgreSQL')
+            return
+
+        force = options['force']
+        while True:
+            if refresh_product_stats(force=force):
+                self.stdout.write('✅ Статистика товаров пересчитана')
+            force = False
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
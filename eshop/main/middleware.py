@@ -1,58 +1,91 @@
+import logging
 import time
 
-from django.core.cache import cache
-from django.utils.deprecation import MiddlewareMixin
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.functional import SimpleLazyObject
 
+logger = logging.getLogger(__name__)
 
-class PerformanceMiddleware(MiddlewareMixin):
+
+class PerformanceMiddleware:
     """Middleware для мониторинга производительности"""
     
-    def process_request(self, request):
-        request.start_time = time.time()
-        return None
-    
-    def process_response(self, request, response):
-        if hasattr(request, 'start_time'):
-            duration = time.time() - request.start_time
-            response['X-Request-Time'] = str(duration)
-            
-            # Логируем медленные запросы (> 1 секунды)
-            if duration > 1.0:
-                print(f"Медленный запрос: {request.path} - {duration:.2f}s")
+    # Порог медленного запроса в секундах
+    slow_request_threshold = 1.0
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        # Монотонные часы не зависят от перевода системного времени
+        start_time = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start_time
+        
+        # Время обработки отдаем клиенту только в режиме отладки
+        if settings.DEBUG:
+            response['X-Request-Time'] = f'{duration:.4f}'
+        
+        # Логируем медленные запросы
+        if duration > self.slow_request_threshold:
+            logger.warning(
+                'Медленный запрос: %s - %.2fs', request.path, duration
+            )
         
         return response
 
 
-class CacheMiddleware(MiddlewareMixin):
+class CacheMiddleware:
     """Middleware для кэширования часто запрашиваемых данных"""
     
-    def process_request(self, request):
-        # Кэшируем категории для всех страниц
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        # Категории загружаются из кэша только при первом обращении:
+        # запросам, которым они не нужны (API, JSON), это ничего не стоит
         if not hasattr(request, 'cached_categories'):
-            categories = cache.get('categories_all')
-            if categories is None:
-                from .models import Category
-                categories = Category.objects.all()
-                cache.set('categories_all', categories, 3600)
-            request.cached_categories = categories
+            from .models import Category
+            request.cached_categories = SimpleLazyObject(Category.get_all_cached)
         
-        return None
+        return self.get_response(request)
 
 
-class SecurityMiddleware(MiddlewareMixin):
+class SecurityMiddleware:
     """Middleware для улучшения безопасности"""
     
-    def process_response(self, request, response):
-        # Добавляем заголовки безопасности
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'DENY'
-        response['X-XSS-Protection'] = '1; mode=block'
+    # Заголовки безопасности собраны один раз на уровне класса
+    SECURITY_HEADERS = (
+        ('X-Content-Type-Options', 'nosniff'),
+        ('X-Frame-Options', 'DENY'),
+        ('X-XSS-Protection', '1; mode=block'),
+    )
+    MAX_UPLOAD_SIZE = 5 * 1024 * 1024  # 5MB
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        # Слишком большую загрузку отклоняем до вызова представления
+        if self.is_upload_too_large(request):
+            response = HttpResponse('Файл слишком большой', status=413)
+        else:
+            response = self.get_response(request)
         
-        # Ограничиваем размер загружаемых файлов
-        if request.method == 'POST' and request.content_type and 'multipart' in request.content_type:
-            content_length = request.META.get('CONTENT_LENGTH', 0)
-            if content_length and int(content_length) > 5 * 1024 * 1024:  # 5MB
-                from django.http import HttpResponse
-                return HttpResponse('Файл слишком большой', status=413)
+        # Добавляем заголовки безопасности (не перезаписывая уже заданные)
+        headers = response.headers
+        for name, value in self.SECURITY_HEADERS:
+            headers.setdefault(name, value)
         
         return response
+    
+    def is_upload_too_large(self, request):
+        """Проверка размера multipart-загрузки по заголовку Content-Length"""
+        if request.method != 'POST' or 'multipart' not in (request.content_type or ''):
+            return False
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return False
+        return content_length > self.MAX_UPLOAD_SIZE
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-15 18:03
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEX_NAME = 'main_produc_search_vector_gin'
+
+
+def create_search_index(apps, schema_editor):
+    """GIN-индекс и заполнение вектора для существующих товаров (PostgreSQL)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        'ON main_product USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        "UPDATE main_product SET search_vector = "
+        "setweight(to_tsvector(coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector(coalesce(description, '')), 'B')"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_cart_main_cart_user_id_b8784b_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.3 on 2026-10-15 18:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_product_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cart',
+            name='main_cart_user_id_b8784b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cart',
+            name='main_cart_session_9d610b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cartitem',
+            name='main_cartit_cart_id_8b08d4_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cartitem',
+            name='main_cartit_product_ef6c1e_idx',
+        ),
+        migrations.AlterField(
+            model_name='cart',
+            name='user',
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='cart',
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='items',
+                to='main.cart',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(
+                condition=models.Q(('user__isnull', False)),
+                fields=['user'],
+                name='main_cart_user_notnull_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(
+                condition=models.Q(('session_key__isnull', False)),
+                fields=['session_key'],
+                name='main_cart_session_notnull_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-15 18:13
+
+from django.db import migrations, models
+
+
+def fill_image_url(apps, schema_editor):
+    """Заполнение image_url для уже загруженных изображений"""
+    Product = apps.get_model('main', 'Product')
+    products = Product.objects.using(schema_editor.connection.alias)
+    updated = []
+    for product in products.exclude(image='').only('id', 'image'):
+        product.image_url = product.image.url
+        updated.append(product)
+    products.bulk_update(updated, ['image_url'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_cart_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_url',
+            field=models.CharField(blank=True, editable=False, max_length=512),
+        ),
+        migrations.RunPython(fill_image_url, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-15 18:20
+
+from django.db import migrations
+
+
+def rebuild_search_vector(config=None):
+    """
+    Пересчет поискового вектора (PostgreSQL); без config - конфигурация
+    по умолчанию, как в миграции 0005
+    """
+    def rebuild(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        to_tsvector = 'to_tsvector(%s, ' if config else 'to_tsvector('
+        params = [config, config] if config else None
+        schema_editor.execute(
+            "UPDATE main_product SET search_vector = "
+            f"setweight({to_tsvector}coalesce(name, '')), 'A') || "
+            f"setweight({to_tsvector}coalesce(description, '')), 'B')",
+            params,
+        )
+    return rebuild
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_product_image_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            rebuild_search_vector('russian'),
+            rebuild_search_vector(),
+        ),
+    ]
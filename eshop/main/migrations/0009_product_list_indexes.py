@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-15 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_product_search_vector_russian'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='main_produc_availab_2da954_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='main_produc_categor_f3ed79_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(
+                condition=models.Q(('available', True)),
+                fields=['category', 'name'],
+                name='main_product_avl_name_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(
+                condition=models.Q(('available', True)),
+                fields=['category', 'price'],
+                name='main_product_avl_price_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(
+                condition=models.Q(('available', True)),
+                fields=['category', 'created'],
+                name='main_product_avl_created_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-15 19:05
+
+from django.db import migrations
+
+# Счетчики каталога одной строкой; id нужен уникальному индексу,
+# без которого невозможен REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE_VIEW_SQL = [
+    'CREATE MATERIALIZED VIEW main_product_stats AS SELECT '
+    '1 AS id, '
+    'COUNT(*) FILTER (WHERE available) AS total_products, '
+    '(SELECT COUNT(*) FROM main_category) AS total_categories, '
+    'AVG(price) FILTER (WHERE available) AS avg_price '
+    'FROM main_product',
+    'CREATE UNIQUE INDEX main_product_stats_id_idx ON main_product_stats (id)',
+]
+
+DROP_VIEW_SQL = 'DROP MATERIALIZED VIEW IF EXISTS main_product_stats'
+
+
+def create_view(apps, schema_editor):
+    """Материализованное представление статистики (только PostgreSQL)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_VIEW_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_view(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_VIEW_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_cart_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_view, drop_view),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Отметка "статистика устарела" хранится в БД, а не в кэше: ее ставит
+# веб-процесс, а снимает команда refresh_product_stats, и без общего
+# кэша (Redis) они не видят отметки друг друга. Одна строка; true -
+# представление нужно пересчитать после применения миграции
+CREATE_TABLE_SQL = [
+    'CREATE TABLE main_product_stats_state ('
+    'id smallint PRIMARY KEY CHECK (id = 1), '
+    'stale boolean NOT NULL)',
+    'INSERT INTO main_product_stats_state (id, stale) VALUES (1, true)',
+]
+
+DROP_TABLE_SQL = 'DROP TABLE IF EXISTS main_product_stats_state'
+
+
+def create_table(apps, schema_editor):
+    """Таблица отметки устаревания статистики (только PostgreSQL)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_TABLE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_TABLE_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_product_stats_view'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_table, drop_table),
+    ]
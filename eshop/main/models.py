@@ -1,7 +1,21 @@
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchVector,
+    SearchVectorField,
+)
 from django.core.cache import cache
-from django.db import models
+from django.db import connections, models, router
 from django.urls import reverse
+from django.utils import timezone
+
+from .utils import (
+    CATALOG_NAMESPACE,
+    bump_namespace,
+    get_or_set_locked,
+    in_bulk_ordered,
+    ns_key,
+)
 
 
 class Category(models.Model):
@@ -28,13 +42,58 @@ class Category(models.Model):
     @classmethod
     def get_all_cached(cls):
         """Получение всех категорий с кэшированием"""
-        cache_key = 'categories_all'
-        categories = cache.get(cache_key)
-        if categories is None:
-            categories = cls.objects.all()
-            cache.set(cache_key, categories, 3600)  # 1 час
+        # В кэше хранятся только значения полей (кортежи), а не
+        # сериализованные экземпляры модели; объекты собираются без запроса
+        field_names = [field.attname for field in cls._meta.concrete_fields]
+        rows = cache.get_or_set(
+            ns_key(CATALOG_NAMESPACE, 'categories'),
+            lambda: list(cls.objects.values_list(*field_names)),
+            3600,  # 1 час
+        )
+        db = cls.objects.db
+        return [cls.from_db(db, field_names, row) for row in rows]
+
+    @classmethod
+    def get_all_with_counts_cached(cls):
+        """
+        Все категории с числом доступных товаров (product_count):
+        один запрос с GROUP BY, результат кэшируется
+        """
+        field_names = [field.attname for field in cls._meta.concrete_fields]
+        rows = cache.get_or_set(
+            ns_key(CATALOG_NAMESPACE, 'cat', 'with_counts'),
+            lambda: list(
+                # GROUP BY теряет Meta.ordering - сортировка задается явно
+                cls.objects.annotate(
+                    product_count=models.Count(
+                        'products', filter=models.Q(products__available=True)
+                    )
+                ).order_by('name').values_list(*field_names, 'product_count')
+            ),
+            3600,  # 1 час
+        )
+        db = cls.objects.db
+        categories = []
+        for *values, product_count in rows:
+            category = cls.from_db(db, field_names, values)
+            category.product_count = product_count
+            categories.append(category)
         return categories
 
+    @classmethod
+    def get_slug_map(cls):
+        """Словарь slug -> id всех категорий с кэшированием"""
+        return cache.get_or_set(
+            ns_key(CATALOG_NAMESPACE, 'slug_map'),
+            lambda: dict(cls.objects.values_list('slug', 'id')),
+            3600,  # 1 час
+        )
+
+    @classmethod
+    def clear_cache(cls):
+        """Очистка кэша категорий (вызывается сигналами main/signals.py)"""
+        bump_namespace(CATALOG_NAMESPACE)
+
 
 class Product(models.Model):
     name = models.CharField(
@@ -42,6 +101,9 @@ class Product(models.Model):
     )
     slug = models.SlugField(max_length=120, unique=True)
     image = models.ImageField(upload_to='products/%Y/%m/%d', blank=True)
+    # URL изображения, вычисленный при сохранении: сериализаторам и шаблонам
+    # не нужно обращаться к хранилищу на каждую строку
+    image_url = models.CharField(max_length=512, blank=True, editable=False)
     description = models.TextField(blank=True, verbose_name='Описание')
     price = models.DecimalField(max_digits=10, decimal_places=2)
     available = models.BooleanField(default=True)
@@ -50,16 +112,45 @@ class Product(models.Model):
     category = models.ForeignKey(
         Category, related_name='products', on_delete=models.CASCADE
     )
+    # Поисковый вектор по названию и описанию; заполняется только на
+    # PostgreSQL, GIN-индекс создается миграцией 0005
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Колонки, которые выводят карточки товаров в списках и на главной
+    # (без поискового вектора и служебных полей); для .only()
+    card_fields = (
+        'id', 'name', 'slug', 'image_url', 'description', 'price',
+        'available', 'created', 'category__name', 'category__slug',
+    )
+    # Колонки товара, которые выводит страница корзины
+    cart_fields = ('id', 'name', 'slug', 'image_url', 'price', 'category__name')
 
     class Meta:
         ordering = ('name',)
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
+        # Списки товаров выбираются по available=True (и категории) и
+        # сортируются по name, price или created: частичные составные индексы
+        # под каждую сортировку хранят только доступные товары. Отдельный
+        # индекс по малоселективному available только сбивал планировщик
         indexes = [
-            models.Index(fields=['available']),
             models.Index(fields=['price']),
             models.Index(fields=['created']),
-            models.Index(fields=['category', 'available']),
+            models.Index(
+                fields=['category', 'name'],
+                name='main_product_avl_name_idx',
+                condition=models.Q(available=True),
+            ),
+            models.Index(
+                fields=['category', 'price'],
+                name='main_product_avl_price_idx',
+                condition=models.Q(available=True),
+            ),
+            models.Index(
+                fields=['category', 'created'],
+                name='main_product_avl_created_idx',
+                condition=models.Q(available=True),
+            ),
         ]
 
     def __str__(self):
@@ -68,28 +159,83 @@ class Product(models.Model):
     def get_absolute_url(self):
         return reverse('main:product_detail', args=[self.id, self.slug])
     
+    def save(self, *args, **kwargs):
+        """Переопределяем save для обновления URL изображения и поискового вектора"""
+        super().save(*args, **kwargs)
+        self.update_image_url()
+        self.update_search_vector()
+
+    def update_image_url(self):
+        """Сохранение URL изображения (имя файла известно только после save)"""
+        image_url = self.image.url if self.image else ''
+        if image_url == self.image_url:
+            return
+        self.image_url = image_url
+        Product.objects.using(self._state.db).filter(pk=self.pk).update(
+            image_url=image_url
+        )
+    
+    def update_search_vector(self):
+        """Пересчет поискового вектора в БД (только PostgreSQL)"""
+        if connections[self._state.db].vendor != 'postgresql':
+            return
+        Product.objects.using(self._state.db).filter(pk=self.pk).update(
+            search_vector=(
+                SearchVector('name', weight='A', config=self.search_config)
+                + SearchVector('description', weight='B', config=self.search_config)
+            )
+        )
+    
     @classmethod
     def get_featured_products(cls, limit=8):
         """Получение популярных товаров с кэшированием"""
-        cache_key = 'featured_products'
-        products = cache.get(cache_key)
-        if products is None:
-            products = cls.objects.select_related('category').filter(
+        # Кэшируются только id товаров; сами товары читаются одним
+        # запросом по первичному ключу
+        ids = get_or_set_locked(
+            ns_key(CATALOG_NAMESPACE, 'featured_ids'),
+            lambda: list(cls.objects.filter(
                 available=True
-            ).order_by('-created')[:limit]
-            cache.set(cache_key, products, 1800)  # 30 минут
-        return products
+            ).order_by('-created').values_list('id', flat=True)[:limit]),
+            1800,  # 30 минут
+        )
+        return in_bulk_ordered(
+            cls.objects.select_related('category')
+            .only(*cls.card_fields)
+            .filter(available=True),
+            ids,
+        )
     
+    # Запросы короче этого ищутся по началу названия, а не по словам
+    min_full_text_query_length = 3
+    # Конфигурация полнотекстового поиска PostgreSQL: русский стеммер
+    # сводит словоформы ("электроника", "электронику") к одной лексеме
+    search_config = 'russian'
+
+    @classmethod
+    def filter_search(cls, queryset, query):
+        """
+        Фильтр товаров по поисковому запросу: на PostgreSQL - полнотекстовый
+        поиск по search_vector (GIN-индекс), для коротких запросов - по
+        началу названия; на остальных СУБД - вхождение подстроки
+        """
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.filter(
+                models.Q(name__icontains=query) |
+                models.Q(description__icontains=query)
+            )
+        if len(query) < cls.min_full_text_query_length:
+            return queryset.filter(name__istartswith=query)
+        return queryset.filter(
+            search_vector=SearchQuery(query, config=cls.search_config)
+        )
+
     @classmethod
     def search_products(cls, query, category=None):
         """Поиск товаров с оптимизацией"""
         queryset = cls.objects.select_related('category').filter(available=True)
         
         if query:
-            queryset = queryset.filter(
-                models.Q(name__icontains=query) | 
-                models.Q(description__icontains=query)
-            )
+            queryset = cls.filter_search(queryset, query)
         
         if category:
             queryset = queryset.filter(category=category)
@@ -98,17 +244,39 @@ class Product(models.Model):
 
 
 class Cart(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    # Индекс по user задан в Meta как частичный (без строк с NULL)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True, db_index=False
+    )
     session_key = models.CharField(max_length=40, null=True, blank=True)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
+    # Итоги корзины поддерживают триггеры БД на main_cartitem и изменение
+    # цены в main_product (миграция 0010); приложение их не записывает
+    items_count = models.PositiveIntegerField(default=0, editable=False)
+    subtotal = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False
+    )
+
+    # Поля, которые ведут триггеры БД
+    trigger_fields = ('items_count', 'subtotal')
 
     class Meta:
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзины'
+        # Корзина принадлежит либо пользователю, либо сессии: частичные
+        # индексы не хранят строки с NULL в индексируемом поле
         indexes = [
-            models.Index(fields=['user']),
-            models.Index(fields=['session_key']),
+            models.Index(
+                fields=['user'],
+                name='main_cart_user_notnull_idx',
+                condition=models.Q(user__isnull=False),
+            ),
+            models.Index(
+                fields=['session_key'],
+                name='main_cart_session_notnull_idx',
+                condition=models.Q(session_key__isnull=False),
+            ),
         ]
 
     def __str__(self):
@@ -116,34 +284,51 @@ class Cart(models.Model):
             return f"Корзина пользователя {self.user.username}"
         return f"Корзина сессии {self.session_key}"
 
+    def save(self, *args, **kwargs):
+        """
+        Сохранение без полей итогов: значения в памяти могут устареть,
+        а в БД их обновляют триггеры
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.trigger_fields
+            ]
+        super().save(*args, **kwargs)
+
+    def _items_prefetched(self):
+        """Загружены ли товары корзины через prefetch_related"""
+        return 'items' in getattr(self, '_prefetched_objects_cache', {})
+
     @property
     def total_price(self):
-        """Общая стоимость корзины с кэшированием"""
-        cache_key = f'cart_total_{self.id}'
-        total = cache.get(cache_key)
-        if total is None:
-            total = sum(item.total_price for item in self.items.all())
-            cache.set(cache_key, total, 300)  # 5 минут
-        return total
+        """Общая стоимость корзины"""
+        if self._items_prefetched():
+            return sum(item.total_price for item in self.items.all())
+        return self.subtotal
 
     @property
     def total_items(self):
-        """Общее количество товаров в корзине с кэшированием"""
-        cache_key = f'cart_items_{self.id}'
-        total = cache.get(cache_key)
-        if total is None:
-            total = sum(item.quantity for item in self.items.all())
-            cache.set(cache_key, total, 300)  # 5 минут
-        return total
-    
-    def clear_cache(self):
-        """Очистка кэша корзины"""
-        cache.delete(f'cart_total_{self.id}')
-        cache.delete(f'cart_items_{self.id}')
+        """Общее количество товаров в корзине"""
+        if self._items_prefetched():
+            return sum(item.quantity for item in self.items.all())
+        return self.items_count
+
+    @classmethod
+    def get_totals(cls, cart_id):
+        """Количество товаров и стоимость корзины (поиск по первичному ключу)"""
+        row = cls.objects.filter(pk=cart_id).values_list(
+            'items_count', 'subtotal'
+        ).first()
+        items_count, subtotal = row or (0, 0)
+        return {'total_items': items_count, 'total_price': subtotal}
 
 
 class CartItem(models.Model):
-    cart = models.ForeignKey(Cart, related_name='items', on_delete=models.CASCADE)
+    # Поиск по cart обслуживает уникальный индекс (cart, product)
+    cart = models.ForeignKey(
+        Cart, related_name='items', on_delete=models.CASCADE, db_index=False
+    )
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     created = models.DateTimeField(auto_now_add=True)
@@ -152,26 +337,98 @@ class CartItem(models.Model):
     class Meta:
         verbose_name = 'Товар в корзине'
         verbose_name_plural = 'Товары в корзине'
+        # Уникальный индекс (cart, product) покрывает и выборки по cart;
+        # для product остается индекс внешнего ключа
         unique_together = ('cart', 'product')
-        indexes = [
-            models.Index(fields=['cart']),
-            models.Index(fields=['product']),
-        ]
 
     def __str__(self):
         return f"{self.quantity}x {self.product.name}"
 
+    # Максимальное количество одного товара в корзине
+    max_quantity = 99
+
+    @classmethod
+    def add_quantity(cls, cart_id, product_id, quantity, using=None):
+        """
+        Добавление товара в корзину одним запросом INSERT ... ON CONFLICT:
+        новая позиция создается, у существующей количество увеличивается
+        (не больше max_quantity). Атомарно при параллельных добавлениях.
+        Строка вставляется выборкой из товаров, поэтому отсутствующий или
+        недоступный товар не добавляется. Возвращает кортеж
+        (итоговое количество, название товара) или None, если товара нет.
+        БД по умолчанию выбирается роутером, как для записи через ORM.
+        """
+        connection = connections[using or router.db_for_write(cls)]
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        product_table = qn(Product._meta.db_table)
+        # LEAST в PostgreSQL, скалярный MIN в SQLite
+        least = 'LEAST' if connection.vendor == 'postgresql' else 'MIN'
+        # Время приводится к формату, в котором его пишет ORM: иначе на
+        # SQLite строка в сыром запросе не совпадет по формату с
+        # остальными и сортировка по created/updated нарушится
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (cart_id, product_id, quantity, created, updated) '
+                f'SELECT %s, id, %s, %s, %s FROM {product_table} '
+                f'WHERE id = %s AND available = %s '
+                f'ON CONFLICT (cart_id, product_id) DO UPDATE SET '
+                f'quantity = {least}({table}.quantity + EXCLUDED.quantity, %s), '
+                f'updated = EXCLUDED.updated '
+                f'RETURNING quantity, (SELECT name FROM {product_table} '
+                f'WHERE {product_table}.id = {table}.product_id)',
+                [
+                    cart_id, min(quantity, cls.max_quantity), now, now,
+                    product_id, True, cls.max_quantity,
+                ],
+            )
+            return cursor.fetchone()
+
+    @classmethod
+    def set_quantity(cls, cart_id, item_id, quantity):
+        """
+        Новое количество позиции корзины cart_id одним UPDATE, без загрузки
+        строки и полного сохранения модели. Позиции чужих корзин не
+        изменяются. Возвращает False, если позиции в корзине нет.
+        """
+        updated = cls.objects.filter(
+            pk=item_id, cart_id=cart_id
+        ).update(
+            quantity=min(quantity, cls.max_quantity), updated=timezone.now()
+        )
+        return bool(updated)
+
+    @classmethod
+    def change_quantity(cls, cart_id, item_id, delta, using=None):
+        """
+        Изменение количества позиции корзины cart_id на delta одним
+        UPDATE ... RETURNING: новое количество возвращается без повторного
+        чтения строки. Количество не превышает max_quantity и не опускается
+        ниже 1; если изменение уменьшило бы его до нуля, строка не
+        меняется и возвращается None (как и для чужой или удаленной позиции).
+        """
+        connection = connections[using or router.db_for_write(cls)]
+        table = connection.ops.quote_name(cls._meta.db_table)
+        # LEAST в PostgreSQL, скалярный MIN в SQLite
+        least = 'LEAST' if connection.vendor == 'postgresql' else 'MIN'
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET '
+                f'quantity = {least}(quantity + %s, %s), updated = %s '
+                f'WHERE id = %s AND cart_id = %s AND quantity + %s >= 1 '
+                f'RETURNING quantity',
+                [delta, cls.max_quantity, now, item_id, cart_id, delta],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
     @property
     def total_price(self):
+        # Сумма, посчитанная в БД аннотацией line_total, если она есть
+        if hasattr(self, 'line_total'):
+            return self.line_total
         return self.quantity * self.product.price
-    
-    def save(self, *args, **kwargs):
-        """Переопределяем save для очистки кэша"""
-        super().save(*args, **kwargs)
-        self.cart.clear_cache()
-    
-    def delete(self, *args, **kwargs):
-        """Переопределяем delete для очистки кэша"""
-        cart = self.cart
-        super().delete(*args, **kwargs)
-        cart.clear_cache()
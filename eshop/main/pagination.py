@@ -0,0 +1,131 @@
+"""
+Keyset-пагинация для HTML-представлений
+
+Следующая страница выбирается условием по ключу сортировки последней строки
+(WHERE (name, id) > (последнее имя, последний id)) вместо OFFSET: стоимость
+запроса не растет с номером страницы. Предыдущая страница выбирается так же
+по первой строке, в обратном порядке.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+class KeysetPage:
+    """Страница keyset-пагинации (совместима с шаблонами как page_obj)"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по ключу сортировки; ordering должен однозначно задавать
+    порядок строк (последним полем - первичный ключ), например ('-price', '-id')
+    """
+    cursor_query_param = 'after'
+    previous_cursor_query_param = 'before'
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+
+    def page(self, cursor=None, before=None):
+        """
+        Страница после курсора cursor или перед курсором before
+        (без курсоров - первая)
+        """
+        if before:
+            return self._page_before(before)
+
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self.get_seek_filter(self.decode_cursor(cursor)))
+
+        # Лишняя строка показывает, есть ли следующая страница
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        # Страница после курсора - не первая
+        previous_cursor = self.encode_cursor(rows[0]) if cursor and rows else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def _page_before(self, cursor):
+        """Страница перед курсором: выборка в обратном порядке"""
+        reversed_ordering = [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+        queryset = self.queryset.order_by(*reversed_ordering).filter(
+            self.get_seek_filter(self.decode_cursor(cursor), reverse=True)
+        )
+
+        rows = list(queryset[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        if not rows:
+            return KeysetPage(rows, None)
+        previous_cursor = self.encode_cursor(rows[0]) if has_previous else None
+        # Страница перед курсором - не последняя
+        return KeysetPage(rows, self.encode_cursor(rows[-1]), previous_cursor)
+
+    def get_seek_filter(self, values, reverse=False):
+        """
+        Условие "после строки с ключом values" (reverse - "перед строкой")
+        для составного ключа: (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = {}
+        for name, field, value in zip(self.ordering, self.fields, values):
+            descending = name.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{field.name}__{lookup}': value})
+            equal[field.name] = value
+        return condition
+
+    def encode_cursor(self, obj):
+        values = [field.value_to_string(obj) for field in self.fields]
+        data = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [
+                field.to_python(value) for field, value in zip(self.fields, values)
+            ]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            raise Http404('Неверный курсор страницы')
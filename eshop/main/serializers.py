@@ -22,6 +22,9 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
     
     def get_products_count(self, obj):
+        # Количество, посчитанное аннотацией во viewset, без запроса на строку
+        if hasattr(obj, 'products_count'):
+            return obj.products_count
         return obj.products.filter(available=True).count()
 
 
@@ -33,11 +36,14 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'slug', 'image', 'description', 
+            'id', 'name', 'slug', 'image', 'image_url', 'description', 
             'price', 'available', 'created', 'updated', 
             'category', 'category_id'
         ]
-        read_only_fields = ['id', 'created', 'updated']
+        read_only_fields = ['id', 'image_url', 'created', 'updated']
+        # Файл только принимается; в ответе - готовый image_url без
+        # обращения к хранилищу
+        extra_kwargs = {'image': {'write_only': True}}
     
     def validate_price(self, value):
         """Валидация цены"""
@@ -58,23 +64,22 @@ class ProductListSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Product
-        fields = ['id', 'name', 'slug', 'image', 'price', 'category', 'available']
+        fields = ['id', 'name', 'slug', 'image_url', 'price', 'category', 'available']
 
 
 class CartItemSerializer(serializers.ModelSerializer):
     """Сериализатор для товаров в корзине"""
     product = ProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
-    total_price = serializers.SerializerMethodField()
+    total_price = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
     
     class Meta:
         model = CartItem
         fields = ['id', 'product', 'product_id', 'quantity', 'total_price', 'created']
         read_only_fields = ['id', 'created']
     
-    def get_total_price(self, obj):
-        return obj.total_price
-    
     def validate_quantity(self, value):
         """Валидация количества"""
         if value < 1:
@@ -104,6 +109,8 @@ class CartSerializer(serializers.ModelSerializer):
 
 class CartItemCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания товара в корзине"""
+    product_id = serializers.IntegerField()
+    
     class Meta:
         model = CartItem
         fields = ['product_id', 'quantity']
@@ -164,4 +171,6 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'date_joined']
     
     def get_carts_count(self, obj):
+        if hasattr(obj, 'carts_count'):
+            return obj.carts_count
         return obj.cart_set.count()
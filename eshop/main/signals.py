@@ -0,0 +1,43 @@
+"""
+Сигналы приложения main
+"""
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, Product
+from .utils import (
+    bump_index_etag,
+    clear_request_namespace_versions,
+    invalidate_related_cache,
+    mark_product_stats_stale,
+    start_request_namespace_versions,
+)
+
+
+@receiver(request_started)
+def reset_namespace_versions(sender, **kwargs):
+    """Версии пространств имен кэша читаются один раз на запрос"""
+    start_request_namespace_versions()
+
+
+@receiver(request_finished)
+def drop_namespace_versions(sender, **kwargs):
+    """Прочитанные в запросе версии не переживают запрос"""
+    clear_request_namespace_versions()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories_cache(sender, **kwargs):
+    """Сброс кэша категорий при изменении любой категории"""
+    Category.clear_cache()
+    bump_index_etag()
+    mark_product_stats_stale()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_products_cache(sender, instance, **kwargs):
+    """Сброс кэша, связанного с товаром (в т.ч. версии главной страницы)"""
+    invalidate_related_cache(instance)
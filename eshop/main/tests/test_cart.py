@@ -0,0 +1,336 @@
+"""
+Тесты корзины
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from main.anon_cart import COOKIE_NAME, MAX_ITEMS, AnonCart
+from main.models import Cart, CartItem, Category, Product
+
+# Пароли в тестах не проверяются (используется force_login)
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class CartBaseTestCase(TestCase):
+    """Базовый класс: категория, товары и корзина пользователя"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='buyer', password='pass')
+        cls.category = Category.objects.create(name='Категория', slug='category')
+        cls.product = Product.objects.create(
+            name='Товар',
+            slug='product',
+            price=Decimal('10.50'),
+            category=cls.category,
+        )
+        cls.other_product = Product.objects.create(
+            name='Другой товар',
+            slug='other-product',
+            price=Decimal('3.00'),
+            category=cls.category,
+        )
+        cls.cart = Cart.objects.create(user=cls.user)
+
+
+class CartOwnershipTestCase(CartBaseTestCase):
+    """Тесты: пользователь не может изменять позиции чужой корзины"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.intruder = User.objects.create_user(username='intruder', password='pass')
+        cls.item = CartItem.objects.create(
+            cart=cls.cart, product=cls.product, quantity=2
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.intruder)
+
+    def test_update_foreign_item_not_found(self):
+        """Тест обновления позиции чужой корзины"""
+        response = self.client.post(
+            reverse('main:update_cart_item', args=[self.item.id]),
+            json.dumps({'quantity': 50}),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 2)
+
+    def test_update_own_item(self):
+        """Тест обновления позиции своей корзины"""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('main:update_cart_item', args=[self.item.id]),
+            json.dumps({'quantity': 3}),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['new_total'], '31.50')
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 3)
+
+    def test_remove_foreign_item_not_found(self):
+        """Тест удаления позиции чужой корзины"""
+        response = self.client.post(
+            reverse('main:remove_cart_item', args=[self.item.id])
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(CartItem.objects.filter(pk=self.item.pk).exists())
+
+    def test_remove_own_item(self):
+        """Тест удаления позиции своей корзины"""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('main:remove_cart_item', args=[self.item.id])
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(CartItem.objects.filter(pk=self.item.pk).exists())
+
+
+class CartItemAddQuantityTestCase(CartBaseTestCase):
+    """Тесты добавления товара одним запросом INSERT ... ON CONFLICT"""
+
+    def test_creates_item(self):
+        """Тест создания новой позиции"""
+        result = CartItem.add_quantity(self.cart.id, self.product.id, 2)
+
+        self.assertEqual(result, (2, 'Товар'))
+        item = CartItem.objects.get(cart=self.cart, product=self.product)
+        self.assertEqual(item.quantity, 2)
+
+    def test_timestamps_stored_like_orm_writes(self):
+        """Тест: время позиции хранится в том же формате, что и при записи ORM"""
+        CartItem.add_quantity(self.cart.id, self.product.id, 1)
+        item = CartItem.objects.get(cart=self.cart, product=self.product)
+
+        # Сравнение в БД совпадает, только если форматы одинаковые
+        self.assertTrue(
+            CartItem.objects.filter(
+                pk=item.pk, created=item.created, updated=item.updated
+            ).exists()
+        )
+
+    def test_increments_existing_item(self):
+        """Тест увеличения количества существующей позиции"""
+        CartItem.add_quantity(self.cart.id, self.product.id, 2)
+        result = CartItem.add_quantity(self.cart.id, self.product.id, 3)
+
+        self.assertEqual(result, (5, 'Товар'))
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 1)
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 5)
+
+    def test_clamps_to_max_quantity(self):
+        """Тест ограничения количества значением max_quantity"""
+        CartItem.add_quantity(self.cart.id, self.product.id, 60)
+        result = CartItem.add_quantity(self.cart.id, self.product.id, 60)
+        self.assertEqual(result[0], CartItem.max_quantity)
+
+        # Новая позиция тоже ограничивается
+        result = CartItem.add_quantity(self.cart.id, self.other_product.id, 500)
+        self.assertEqual(result[0], CartItem.max_quantity)
+
+    def test_unavailable_product_not_added(self):
+        """Тест: недоступный товар не добавляется"""
+        Product.objects.filter(pk=self.product.pk).update(available=False)
+
+        result = CartItem.add_quantity(self.cart.id, self.product.id, 1)
+
+        self.assertIsNone(result)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_missing_product_not_added(self):
+        """Тест: несуществующий товар не добавляется"""
+        result = CartItem.add_quantity(self.cart.id, 0, 1)
+
+        self.assertIsNone(result)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class CartItemChangeQuantityTestCase(CartBaseTestCase):
+    """Тесты изменения количества одним запросом UPDATE ... RETURNING"""
+
+    def setUp(self):
+        self.item = CartItem.objects.create(
+            cart=self.cart, product=self.product, quantity=2
+        )
+
+    def test_returns_new_quantity(self):
+        """Тест: новое количество возвращается и сохраняется"""
+        self.assertEqual(
+            CartItem.change_quantity(self.cart.id, self.item.id, 1), 3
+        )
+        self.assertEqual(
+            CartItem.change_quantity(self.cart.id, self.item.id, -1), 2
+        )
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 2)
+
+    def test_clamps_to_max_quantity(self):
+        """Тест ограничения количества значением max_quantity"""
+        result = CartItem.change_quantity(self.cart.id, self.item.id, 500)
+        self.assertEqual(result, CartItem.max_quantity)
+
+    def test_does_not_go_below_one(self):
+        """Тест: уменьшение до нуля не выполняется"""
+        CartItem.change_quantity(self.cart.id, self.item.id, -1)
+
+        self.assertIsNone(
+            CartItem.change_quantity(self.cart.id, self.item.id, -1)
+        )
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 1)
+
+    def test_foreign_cart_not_changed(self):
+        """Тест: позиция чужой корзины не изменяется"""
+        other_user = User.objects.create_user(username='other', password='pass')
+        other_cart = Cart.objects.create(user=other_user)
+
+        self.assertIsNone(
+            CartItem.change_quantity(other_cart.id, self.item.id, 1)
+        )
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 2)
+
+
+class CartTotalsTriggersTestCase(CartBaseTestCase):
+    """Тесты триггеров, поддерживающих items_count и subtotal корзины"""
+
+    def assertTotals(self, items_count, subtotal):
+        totals = Cart.objects.values_list('items_count', 'subtotal').get(
+            pk=self.cart.pk
+        )
+        self.assertEqual(totals, (items_count, Decimal(subtotal)))
+
+    def test_insert(self):
+        """Тест добавления позиции"""
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+        CartItem.add_quantity(self.cart.id, self.other_product.id, 1)
+
+        self.assertTotals(3, '24.00')
+
+    def test_update(self):
+        """Тест изменения количества и товара позиции"""
+        item = CartItem.objects.create(
+            cart=self.cart, product=self.product, quantity=2
+        )
+        CartItem.set_quantity(self.cart.id, item.id, 4)
+        self.assertTotals(4, '42.00')
+
+        item.refresh_from_db()
+        item.product = self.other_product
+        item.save()
+        self.assertTotals(4, '12.00')
+
+    def test_delete(self):
+        """Тест удаления позиций"""
+        item = CartItem.objects.create(
+            cart=self.cart, product=self.product, quantity=2
+        )
+        CartItem.objects.create(
+            cart=self.cart, product=self.other_product, quantity=1
+        )
+
+        item.delete()
+        self.assertTotals(1, '3.00')
+
+        self.cart.items.all().delete()
+        self.assertTotals(0, '0.00')
+
+    def test_product_price_change(self):
+        """Тест изменения цены товара в корзине"""
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+        other_cart = Cart.objects.create(session_key='other')
+
+        self.product.price = Decimal('12.00')
+        self.product.save()
+
+        self.assertTotals(2, '24.00')
+        self.assertEqual(
+            Cart.objects.values_list('subtotal', flat=True).get(pk=other_cart.pk),
+            Decimal('0.00'),
+        )
+
+
+class AnonCartTestCase(CartBaseTestCase):
+    """Тесты корзины анонимного пользователя в подписанной cookie"""
+
+    def setUp(self):
+        self.client = Client()
+
+    def add(self, product, quantity=1):
+        return self.client.post(
+            reverse('main:add_to_cart', args=[product.id]),
+            json.dumps({'quantity': quantity}),
+            content_type='application/json',
+        )
+
+    def test_cookie_round_trip(self):
+        """Тест сохранения корзины в cookie и чтения ее следующим запросом"""
+        self.add(self.product, 2)
+        self.add(self.other_product)
+
+        self.assertIn(COOKIE_NAME, self.client.cookies)
+        response = self.client.get(reverse('main:cart'))
+        quantities = {
+            item.product.id: item.quantity
+            for item in response.context['cart_items']
+        }
+        self.assertEqual(
+            quantities, {self.product.id: 2, self.other_product.id: 1}
+        )
+        self.assertEqual(response.context['total'], Decimal('24.00'))
+        self.assertFalse(Cart.objects.filter(user__isnull=True).exists())
+
+    def test_tampered_cookie_ignored(self):
+        """Тест: измененная cookie не принимается"""
+        self.add(self.product, 2)
+        # Подпись остается прежней, меняется только содержимое
+        value = self.client.cookies[COOKIE_NAME].value
+        _, timestamp, signature = value.rsplit(':', 2)
+        payload = json.dumps({self.product.id: 50}, separators=(',', ':'))
+        self.client.cookies[COOKIE_NAME] = f'{payload}:{timestamp}:{signature}'
+
+        response = self.client.get(reverse('main:cart'))
+
+        self.assertEqual(list(response.context['cart_items']), [])
+
+    def test_max_items(self):
+        """Тест ограничения числа позиций MAX_ITEMS"""
+        cart = AnonCart({product_id: 1 for product_id in range(1, MAX_ITEMS + 1)})
+
+        self.assertIsNone(cart.add(MAX_ITEMS + 1, 1))
+        # Количество уже лежащего товара увеличивать можно
+        self.assertEqual(cart.add(1, 1), 2)
+        self.assertEqual(len(cart.items), MAX_ITEMS)
+
+    def test_merge_into_on_login(self):
+        """Тест переноса анонимной корзины в корзину пользователя при входе"""
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+        self.add(self.product, 2)
+        self.add(self.other_product)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('main:cart'))
+
+        quantities = dict(
+            CartItem.objects.filter(cart=self.cart).values_list(
+                'product_id', 'quantity'
+            )
+        )
+        self.assertEqual(
+            quantities, {self.product.id: 3, self.other_product.id: 1}
+        )
+        self.assertEqual(response.context['total_items'], 4)
+        # Перенесенная корзина удаляется из cookie
+        self.assertEqual(response.cookies[COOKIE_NAME].value, '')
@@ -0,0 +1,106 @@
+"""
+Тесты keyset-пагинации списка товаров
+"""
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from main.models import Category, Product
+from main.pagination import KeysetPaginator
+
+
+class KeysetPaginationTestCase(TestCase):
+    """Тесты курсоров списка товаров"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Категория', slug='category')
+        # 30 товаров с тремя одинаковыми ценами: порядок внутри цены
+        # задает только id
+        Product.objects.bulk_create([
+            Product(
+                name=f'Товар {i:02d}',
+                slug=f'product-{i}',
+                price=Decimal(10 + i % 3),
+                category=cls.category,
+            )
+            for i in range(30)
+        ])
+        cls.url = reverse('main:product_list')
+
+    def walk(self, params, direction='after'):
+        """Обход всех страниц по ссылкам; список имен товаров по страницам"""
+        pages = []
+        response = self.client.get(self.url, params)
+        while True:
+            page = response.context['page_obj']
+            pages.append([product.name for product in page])
+            cursor = page.next_cursor if direction == 'after' else page.previous_cursor
+            if cursor is None:
+                return pages, page
+            response = self.client.get(self.url, {**params, direction: cursor})
+
+    def test_next_cursor(self):
+        """Тест курсора следующей страницы"""
+        response = self.client.get(self.url)
+        page = response.context['page_obj']
+
+        self.assertEqual(len(page), 12)
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+        self.assertContains(response, f'after={page.next_cursor}')
+
+        paginator = KeysetPaginator(Product.objects.all(), 12, ('name', 'id'))
+        self.assertEqual(
+            paginator.decode_cursor(page.next_cursor),
+            [page[-1].name, page[-1].id],
+        )
+
+    def test_bad_cursor_not_found(self):
+        """Тест: неверный курсор дает 404"""
+        for cursor in ('bad', 'W10', 'WyJhIl0'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'after': cursor})
+                self.assertEqual(response.status_code, 404)
+
+    def test_stable_order_with_equal_keys(self):
+        """Тест: при равных ценах страницы не теряют и не повторяют товары"""
+        for sort in ('price', 'price_desc'):
+            with self.subTest(sort=sort):
+                pages, _ = self.walk({'sort': sort})
+                names = [name for page in pages for name in page]
+
+                self.assertEqual([len(page) for page in pages], [12, 12, 6])
+                self.assertEqual(len(set(names)), 30)
+                ordering = ('-price', '-id') if sort == 'price_desc' else ('price', 'id')
+                expected = list(
+                    Product.objects.order_by(*ordering).values_list('name', flat=True)
+                )
+                self.assertEqual(names, expected)
+
+    def test_previous_cursor(self):
+        """Тест обратного обхода страниц по курсору предыдущей страницы"""
+        forward, last_page = self.walk({'sort': 'price'})
+        response = self.client.get(
+            self.url, {'sort': 'price', 'before': last_page.previous_cursor}
+        )
+        self.assertEqual(
+            [product.name for product in response.context['page_obj']],
+            forward[1],
+        )
+
+        backward, first_page = self.walk(
+            {'sort': 'price', 'before': last_page.previous_cursor}, 'before'
+        )
+        self.assertEqual(backward, forward[-2::-1])
+        self.assertFalse(first_page.has_previous())
+
+    def test_legacy_page_param(self):
+        """Тест старых ссылок с номером страницы"""
+        response = self.client.get(self.url, {'page': 1, 'sort': 'price'})
+        self.assertRedirects(
+            response, f'{self.url}?sort=price', status_code=301
+        )
+
+        response = self.client.get(self.url, {'page': 3})
+        self.assertEqual(response.status_code, 404)
@@ -2,13 +2,22 @@
 Тесты производительности для проверки оптимизации
 """
 import time
+from unittest import mock
 
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.db import connection, reset_queries
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from main.models import Cart, CartItem, Category, Product
+from main.utils import (
+    CATALOG_NAMESPACE,
+    bump_namespace,
+    clear_request_namespace_versions,
+    ns_key,
+    start_request_namespace_versions,
+)
 
 
 class PerformanceTestCase(TestCase):
@@ -105,8 +114,8 @@ class PerformanceTestCase(TestCase):
         start_time = time.time()
         
         response = self.client.get(
-            reverse('main:search_api'),
-            {'q': 'электроника'}
+            reverse('main:product_list'),
+            {'search': 'электроника'}
         )
         
         search_time = time.time() - start_time
@@ -176,17 +185,19 @@ class PerformanceTestCase(TestCase):
 
     def test_pagination_performance(self):
         """Тест производительности пагинации"""
-        # Тестируем разные страницы
+        # Тестируем разные страницы (переход по курсору следующей страницы)
+        params = {}
         for page in [1, 2, 3]:
             start_time = time.time()
             response = self.client.get(
                 reverse('main:product_list'),
-                {'page': page}
+                params
             )
             page_time = time.time() - start_time
             
             self.assertEqual(response.status_code, 200)
             self.assertLess(page_time, 0.1)  # Каждая страница должна загружаться быстро
+            params = {'after': response.context['page_obj'].next_cursor}
             
             print(f"📄 Страница {page}: {page_time:.3f}s")
 
@@ -230,6 +241,20 @@ class CacheTestCase(TestCase):
         print(f"⏱️  Первый вызов: {first_time:.4f}s")
         print(f"⏱️  Второй вызов: {second_time:.4f}s")
 
+    def test_categories_with_counts_ordered_by_name(self):
+        """Тест: категории с количеством товаров упорядочены по названию"""
+        Category.objects.create(name='Аксессуары', slug='accessories')
+        cache.clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            categories = Category.get_all_with_counts_cached()
+
+        self.assertEqual(
+            [category.name for category in categories],
+            ['Аксессуары', 'Тестовая категория'],
+        )
+        self.assertIn('ORDER BY', queries.captured_queries[-1]['sql'])
+
     def test_product_caching(self):
         """Тест кэширования товаров"""
         # Создаем тестовые товары
@@ -245,21 +270,51 @@ class CacheTestCase(TestCase):
         # Очищаем кэш
         cache.clear()
         
-        # Первый вызов - без кэша
+        # Первый вызов - без кэша: id товаров и сами товары
         start_time = time.time()
-        products1 = Product.get_featured_products(5)
+        with self.assertNumQueries(2):
+            products1 = Product.get_featured_products(5)
         first_time = time.time() - start_time
         
-        # Второй вызов - с кэшем
+        # Второй вызов - id из кэша, читаются только товары. Число
+        # запросов проверяется вместо времени: разница во времени
+        # меньше миллисекунды и зависит от загрузки машины
         start_time = time.time()
-        products2 = Product.get_featured_products(5)
+        with self.assertNumQueries(1):
+            products2 = Product.get_featured_products(5)
         second_time = time.time() - start_time
         
         # Результаты должны быть одинаковыми
         self.assertEqual(len(products1), len(products2))
         
-        # Второй вызов должен быть быстрее
-        self.assertLess(second_time, first_time)
-        
         print(f"⏱️  Первый вызов: {first_time:.4f}s")
         print(f"⏱️  Второй вызов: {second_time:.4f}s")
+
+    def test_namespace_version_read_once_per_request(self):
+        """Тест: версия пространства имен читается из кэша раз за запрос"""
+        cache.clear()
+        # То, что делают обработчики request_started/request_finished
+        # (сам сигнал request_finished закрыл бы соединение с тестовой БД)
+        start_request_namespace_versions()
+        self.addCleanup(clear_request_namespace_versions)
+
+        with mock.patch.object(
+            cache, 'get_or_set', wraps=cache.get_or_set
+        ) as get_or_set:
+            first = ns_key(CATALOG_NAMESPACE, 'a')
+            second = ns_key(CATALOG_NAMESPACE, 'b')
+
+            self.assertEqual(get_or_set.call_count, 1)
+            self.assertEqual(first.rsplit(':', 1)[0], second.rsplit(':', 1)[0])
+
+            # Запрос, сменивший версию, сразу читает новые ключи
+            bump_namespace(CATALOG_NAMESPACE)
+            self.assertNotEqual(ns_key(CATALOG_NAMESPACE, 'a'), first)
+            self.assertEqual(get_or_set.call_count, 1)
+
+        # После запроса версия снова читается из кэша
+        clear_request_namespace_versions()
+        self.assertEqual(
+            ns_key(CATALOG_NAMESPACE, 'a'),
+            f'{CATALOG_NAMESPACE}:v{cache.get(f"{CATALOG_NAMESPACE}:ver")}:a',
+        )
@@ -1,9 +1,15 @@
 import hashlib
 import json
+import time
+from functools import wraps
+from uuid import uuid4
 
+from asgiref.local import Local
 from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db import connection, transaction
+from django.db.models import Avg
+from django.utils.functional import SimpleLazyObject
 
 
 def generate_cache_key(prefix, *args, **kwargs):
@@ -16,7 +22,9 @@ def generate_cache_key(prefix, *args, **kwargs):
         key_parts.extend([f"{k}:{v}" for k, v in sorted_kwargs])
     
     key_string = "|".join(key_parts)
-    return hashlib.md5(key_string.encode()).hexdigest()
+    # Криптостойкость ключу не нужна: BLAKE2b быстрее MD5, а 16 байт дайджеста
+    # дают ключ той же длины (32 hex-символа)
+    return hashlib.blake2b(key_string.encode(), digest_size=16).hexdigest()
 
 
 def cache_query_result(cache_key, queryset, timeout=300):
@@ -41,17 +49,7 @@ def search_products_optimized(query, category=None, limit=None):
     """Оптимизированный поиск товаров"""
     from .models import Product
     
-    # Создаем базовый queryset
-    queryset = Product.objects.select_related('category').filter(available=True)
-    
-    # Добавляем фильтры
-    if query:
-        # Используем Q объекты для сложных запросов
-        search_filters = Q(name__icontains=query) | Q(description__icontains=query)
-        queryset = queryset.filter(search_filters)
-    
-    if category:
-        queryset = queryset.filter(category=category)
+    queryset = Product.search_products(query, category)
     
     # Оптимизируем сортировку
     queryset = queryset.order_by('name')
@@ -62,44 +60,164 @@ def search_products_optimized(query, category=None, limit=None):
     return queryset
 
 
+# Версия главной страницы: ETag для условных GET и ключ фрагментов шаблона
+INDEX_ETAG_KEY = 'index:etag'
+
+
+def get_index_etag():
+    """Текущий ETag главной страницы"""
+    return cache.get_or_set(INDEX_ETAG_KEY, lambda: uuid4().hex, None)
+
+
+def bump_index_etag():
+    """Смена ETag главной страницы (сбрасывает и кэш ее фрагментов)"""
+    cache.set(INDEX_ETAG_KEY, uuid4().hex, None)
+
+
+# Пространство имен кэша каталога (товары, категории, подборки)
+CATALOG_NAMESPACE = 'catalog'
+
+
+# Версии пространств имен, уже прочитанные в текущем запросе: ключ версии
+# запрашивается из кэша один раз на запрос, а не для каждого ns_key.
+# Словарь создается по сигналу request_started (main/signals.py); вне
+# запроса (команды, фоновые задачи) версия читается каждый раз
+_request_versions = Local()
+
+
+def start_request_namespace_versions():
+    """Начало запроса: версии пространств имен читаются заново"""
+    _request_versions.versions = {}
+
+
+def clear_request_namespace_versions():
+    """Конец запроса: прочитанные версии больше не используются"""
+    _request_versions.versions = None
+
+
+def get_namespace_version(namespace):
+    """
+    Текущая версия пространства имен кэша; начальная версия - время в
+    секундах, чтобы после вытеснения счетчика не вернуться к старым ключам
+    """
+    versions = getattr(_request_versions, 'versions', None)
+    if versions is not None and namespace in versions:
+        return versions[namespace]
+    version = cache.get_or_set(f'{namespace}:ver', lambda: int(time.time()), None)
+    if versions is not None:
+        versions[namespace] = version
+    return version
+
+
+def ns_key(namespace, *parts):
+    """
+    Ключ кэша внутри версионированного пространства имен: после смены
+    версии старые ключи больше не читаются и истекают сами
+    """
+    version = get_namespace_version(namespace)
+    return f'{namespace}:v{version}:' + ':'.join(map(str, parts))
+
+
+def bump_namespace(namespace):
+    """Сброс всех ключей пространства имен одной операцией incr"""
+    version_key = f'{namespace}:ver'
+    try:
+        version = cache.incr(version_key)
+    except ValueError:
+        # Версии еще нет (или она вытеснена из кэша)
+        version = int(time.time())
+        cache.set(version_key, version, None)
+    # Запрос, сменивший версию, дальше читает уже новые ключи
+    versions = getattr(_request_versions, 'versions', None)
+    if versions is not None:
+        versions[namespace] = version
+
+
 def invalidate_related_cache(model_instance):
     """Инвалидация связанного кэша"""
-    if hasattr(model_instance, 'category'):
-        # Инвалидируем кэш категории
-        cache.delete(f'category_products_{model_instance.category.id}')
-        cache.delete('featured_products')
-    
-    # Инвалидируем общий кэш товаров
-    cache.delete('products_all')
-    cache.delete('search_results')
+    # Любой закэшированный ключ каталога сбрасывается сменой версии,
+    # перечислять ключи здесь не нужно
+    bump_namespace(CATALOG_NAMESPACE)
+    bump_index_etag()
+    mark_product_stats_stale()
+
+
+def get_or_set_locked(cache_key, loader, timeout, stale_timeout=None, lock_timeout=10):
+    """
+    Получение значения из кэша с защитой от "эффекта толпы": при промахе
+    значение пересчитывает только процесс, взявший блокировку, остальные
+    получают устаревшую копию (ключ :stale живет дольше основного)
+    """
+    value = cache.get(cache_key)
+    if value is not None:
+        return value
+
+    stale_key = f'{cache_key}:stale'
+    lock_key = f'{cache_key}:lock'
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = loader()
+            cache.set(cache_key, value, timeout)
+            cache.set(stale_key, value, stale_timeout or timeout * 2)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    value = cache.get(stale_key)
+    if value is None:
+        # Устаревшей копии еще нет - считаем без записи в кэш
+        value = loader()
+    return value
+
+
+def in_bulk_ordered(queryset, ids):
+    """Объекты по списку первичных ключей в порядке этого списка"""
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
 
 
 def get_cached_categories():
     """Получение кэшированных категорий"""
-    cache_key = 'categories_all'
-    categories = cache.get(cache_key)
-    
-    if categories is None:
-        from .models import Category
-        categories = list(Category.objects.all())
-        cache.set(cache_key, categories, 3600)  # 1 час
-    
-    return categories
+    from .models import Category
+    return Category.get_all_cached()
 
 
 def get_cached_featured_products(limit=8):
     """Получение кэшированных популярных товаров"""
-    cache_key = f'featured_products_{limit}'
-    products = cache.get(cache_key)
-    
-    if products is None:
-        from .models import Product
-        products = list(Product.objects.select_related('category').filter(
-            available=True
-        ).order_by('-created')[:limit])
-        cache.set(cache_key, products, 1800)  # 30 минут
-    
-    return products
+    from .models import Product
+    return Product.get_featured_products(limit)
+
+
+def resolve_cart(request):
+    """
+    Корзина пользователя из БД; для анонимного пользователя -
+    корзина в подписанной cookie (без запросов к БД)
+    """
+    from .anon_cart import AnonCart
+    from .models import Cart
+
+    if not request.user.is_authenticated:
+        return AnonCart.from_request(request)
+
+    cart, created = Cart.objects.get_or_create(user=request.user)
+    # Товары, добавленные до входа, переносятся в корзину пользователя
+    anon_cart = AnonCart.from_request(request)
+    if anon_cart.items:
+        anon_cart.merge_into(cart.id)
+    return cart
+
+
+def with_cart(view_func):
+    """
+    Декоратор представления: корзина запроса в request.cart. Корзина
+    загружается при первом обращении, представления, которым она
+    не понадобилась, не делают запросов
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        request.cart = SimpleLazyObject(lambda: resolve_cart(request))
+        return view_func(request, *args, **kwargs)
+    return wrapper
 
 
 def optimize_image_upload(image_field):
@@ -111,20 +229,80 @@ def optimize_image_upload(image_field):
     return image_field
 
 
+def _set_product_stats_stale():
+    with connection.cursor() as cursor:
+        # Уже отмеченная строка не перезаписывается
+        cursor.execute(
+            'UPDATE main_product_stats_state SET stale = true WHERE NOT stale'
+        )
+
+
+def mark_product_stats_stale():
+    """
+    Отметка о том, что материализованное представление статистики
+    устарело (на PostgreSQL; на других СУБД статистика считается при
+    чтении). Представление пересчитывает команда refresh_product_stats,
+    а не каждое изменение товара: один пересчет на много изменений.
+    Отметка хранится в таблице main_product_stats_state (миграция 0012),
+    которую видят и веб-процессы, и команда, при любом бэкенде кэша.
+    """
+    if connection.vendor == 'postgresql':
+        # После коммита: пересчет до коммита не увидел бы изменения
+        transaction.on_commit(_set_product_stats_stale)
+
+
+def refresh_product_stats(force=False):
+    """
+    Пересчет материализованного представления, если оно отмечено
+    устаревшим (или force). Возвращает True, если пересчет был.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    # Снятие отметки и пересчет - одна транзакция: если пересчет упадет,
+    # отметка откатится и следующий запуск команды повторит его
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Отметка снимается до пересчета: изменения, сделанные во время
+        # пересчета, отметят представление снова
+        cursor.execute(
+            'UPDATE main_product_stats_state SET stale = false WHERE stale'
+        )
+        if not cursor.rowcount and not force:
+            return False
+        cursor.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY main_product_stats')
+    return True
+
+
 def get_product_stats():
     """Получение статистики товаров"""
-    cache_key = 'product_stats'
-    stats = cache.get(cache_key)
-    
-    if stats is None:
-        from .models import Category, Product
-        stats = {
-            'total_products': Product.objects.filter(available=True).count(),
+    from .models import Category, Product
+
+    if connection.vendor == 'postgresql':
+        # Одна строка материализованного представления (миграция 0011)
+        # вместо COUNT и AVG по всей таблице товаров. Не кэшируется: чтение
+        # и так дешевое, а кэш, заполненный до пересчета представления,
+        # хранил бы устаревшие значения
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT total_products, total_categories, avg_price '
+                'FROM main_product_stats'
+            )
+            total_products, total_categories, avg_price = cursor.fetchone()
+        return {
+            'total_products': total_products,
+            'total_categories': total_categories,
+            'avg_price': avg_price or 0,
+        }
+
+    def load_stats():
+        available = Product.objects.filter(available=True)
+        return {
+            'total_products': available.count(),
             'total_categories': Category.objects.count(),
-            'avg_price': Product.objects.filter(available=True).aggregate(
-                avg_price=models.Avg('price')
+            'avg_price': available.aggregate(
+                avg_price=Avg('price')
             )['avg_price'] or 0,
         }
-        cache.set(cache_key, stats, 3600)  # 1 час
-    
-    return stats
+
+    return cache.get_or_set(
+        ns_key(CATALOG_NAMESPACE, 'product_stats'), load_stats, 3600  # 1 час
+    )
@@ -1,26 +1,75 @@
-import json
-
+import orjson
 from django.core.cache import cache
-from django.db.models import Q
-from django.shortcuts import get_object_or_404
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import Http404, HttpResponse, HttpResponsePermanentRedirect
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.http import require_POST
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import condition, require_POST
 from django.views.generic import DetailView, ListView, TemplateView
 
+from . import cart_buffer
+from .anon_cart import AnonCart, save_anon_cart
 from .models import Cart, CartItem, Category, Product
+from .pagination import KeysetPaginator
+from .utils import (
+    CATALOG_NAMESPACE,
+    get_index_etag,
+    in_bulk_ordered,
+    ns_key,
+    resolve_cart,
+    with_cart,
+)
+
+# Decimal, даты и ленивые строки кодируются как в JsonResponse
+_json_default = DjangoJSONEncoder().default
+
+
+def json_response(data, status=200):
+    """JSON-ответ на orjson (замена JsonResponse для AJAX-представлений корзины)"""
+    return HttpResponse(
+        orjson.dumps(data, default=_json_default),
+        content_type='application/json',
+        status=status,
+    )
+
+
+# Порядок товаров для каждого варианта сортировки
+# (id в конце делает ключ уникальным для keyset-пагинации)
+SORTS = {
+    'name': ('name', 'id'),
+    'price': ('price', 'id'),
+    'price_desc': ('-price', '-id'),
+    'newest': ('-created', '-id'),
+}
+
+
+def _apply_search(queryset, search_query):
+    """Полнотекстовый поиск по товарам; пустой запрос не фильтрует"""
+    if not search_query:
+        return queryset
+    return Product.filter_search(queryset, search_query)
+
+
+def index_etag(request, *args, **kwargs):
+    """ETag главной страницы: меняется при изменении товаров и категорий"""
+    return get_index_etag()
 
 
-# Улучшенный IndexView с кэшированием
-@method_decorator(cache_page(60 * 15), name='dispatch')  # Кэшируем на 15 минут
+# Без изменений браузер получает 304 без рендеринга шаблона; блоки
+# категорий и товаров кэшируются фрагментами по той же версии
+@method_decorator(condition(etag_func=index_etag), name='dispatch')
 class IndexView(TemplateView):
     template_name = 'index.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Используем методы моделей для кэширования
-        context['categories'] = Category.get_all_cached()
-        context['featured_products'] = Product.get_featured_products(8)
+        # Данные загружаются только при промахе кэша фрагментов
+        context['categories'] = SimpleLazyObject(Category.get_all_cached)
+        context['featured_products'] = SimpleLazyObject(
+            lambda: Product.get_featured_products(8)
+        )
+        context['index_etag'] = get_index_etag()
         return context
 
 
@@ -29,51 +78,58 @@ class ProductList(ListView):
     context_object_name = 'products'
     template_name = 'main/product_list.html'
     paginate_by = 12  # Добавляем пагинацию
-    category = None
+    category_id = None
+
+    def get(self, request, *args, **kwargs):
+        # До keyset-пагинации страницы адресовались номером (?page=N):
+        # первая страница перенаправляется на адрес без номера, остальных
+        # страниц по номеру больше нет
+        if 'page' in request.GET:
+            if request.GET['page'] not in ('', '1'):
+                raise Http404('Страницы по номеру не поддерживаются')
+            query = request.GET.copy()
+            del query['page']
+            url = f'{request.path}?{query.urlencode()}' if query else request.path
+            return HttpResponsePermanentRedirect(url)
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
         category_slug = self.kwargs.get('category_slug')
+        queryset = Product.objects.select_related('category').only(
+            *Product.card_fields
+        ).filter(available=True)
         if category_slug:
-            self.category = get_object_or_404(Category, slug=category_slug)
-            queryset = Product.objects.select_related('category').filter(
-                category=self.category, available=True
-            )
-        else:
-            queryset = Product.objects.select_related('category').filter(
-                available=True
-            )
-
-        # Добавляем поиск по названию
-        search_query = self.request.GET.get('search', '')
-        if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query)
-                | Q(description__icontains=search_query)
-            )
-
-        # Добавляем сортировку
-        sort_by = self.request.GET.get('sort', 'name')
-        if sort_by == 'price':
-            queryset = queryset.order_by('price')
-        elif sort_by == 'price_desc':
-            queryset = queryset.order_by('-price')
-        elif sort_by == 'newest':
-            queryset = queryset.order_by('-created')
-        else:
-            queryset = queryset.order_by('name')
-
-        return queryset
+            # id категории берется из кэшированного словаря slug -> id,
+            # без отдельного запроса к таблице категорий
+            self.category_id = Category.get_slug_map().get(category_slug)
+            if self.category_id is None:
+                raise Http404('Категория не найдена')
+            queryset = queryset.filter(category_id=self.category_id)
+
+        queryset = _apply_search(queryset, self.request.GET.get('search', ''))
+        return queryset.order_by(*self.get_ordering())
+
+    def get_ordering(self):
+        # Неизвестная сортировка заменяется сортировкой по названию
+        return SORTS.get(self.request.GET.get('sort', 'name'), SORTS['name'])
+
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset-пагинация вместо OFFSET: глубокие страницы не дороже первой"""
+        paginator = KeysetPaginator(queryset, page_size, self.get_ordering())
+        page = paginator.page(
+            self.request.GET.get(paginator.cursor_query_param),
+            before=self.request.GET.get(paginator.previous_cursor_query_param),
+        )
+        return paginator, page, page.object_list, page.has_other_pages()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Кэшируем категории
-        categories = cache.get('categories_all')
-        if categories is None:
-            categories = Category.objects.all()
-            cache.set('categories_all', categories, 3600)
-
+        # Категории боковой панели вместе с числом товаров - один запрос
+        categories = Category.get_all_with_counts_cached()
         context['categories'] = categories
-        context['category'] = self.category
+        context['category'] = next(
+            (c for c in categories if c.id == self.category_id), None
+        )
         context['search_query'] = self.request.GET.get('search', '')
         context['sort_by'] = self.request.GET.get('sort', 'name')
         return context
@@ -93,84 +149,103 @@ class ProductDetail(DetailView):
         context = super().get_context_data(**kwargs)
         product = self.object
 
-        # Кэшируем рекомендуемые товары
-        cache_key = f'recommended_products_{product.category.id}_{product.id}'
-        recommended_products = cache.get(cache_key)
-        if recommended_products is None:
-            recommended_products = (
-                Product.objects.select_related('category')
-                .filter(category=product.category, available=True)
-                .exclude(id=product.id)[:4]
-            )
-            cache.set(cache_key, recommended_products, 1800)
+        # Кэшируются только id рекомендуемых товаров; сами товары читаются
+        # одним запросом по первичному ключу
+        recommended_ids = cache.get_or_set(
+            ns_key(
+                CATALOG_NAMESPACE, 'recommended', product.category_id, product.id
+            ),
+            lambda: list(
+                Product.objects.filter(
+                    category_id=product.category_id, available=True
+                ).exclude(id=product.id).values_list('id', flat=True)[:4]
+            ),
+            1800,  # 30 минут
+        )
 
-        context['recommended_products'] = recommended_products
+        context['recommended_products'] = in_bulk_ordered(
+            Product.objects.filter(available=True), recommended_ids
+        )
         return context
 
 
-class CartView(TemplateView):
+# Миксин для повторяющейся логики корзины
+class CartMixin:
+    def get_cart(self, request):
+        return resolve_cart(request)
+
+
+@method_decorator(save_anon_cart, name='dispatch')
+class CartView(CartMixin, DetailView):
+    model = Cart
+    context_object_name = 'cart'
     template_name = 'main/cart.html'
 
+    def get_object(self, queryset=None):
+        cart = self.get_cart(self.request)
+        if isinstance(cart, AnonCart):
+            return cart
+        # Отложенные добавления переносятся в БД до чтения корзины
+        cart_buffer.flush_cart(cart.id)
+        # Позиции с товарами и их категориями - одним запросом (только
+        # выводимые колонки); итоги корзины считаются по загруженным
+        # позициям без дополнительных запросов
+        prefetch_related_objects(
+            [cart],
+            Prefetch(
+                'items',
+                queryset=CartItem.objects.select_related(
+                    'product__category'
+                ).only(
+                    'id', 'cart', 'quantity',
+                    *(f'product__{name}' for name in Product.cart_fields),
+                ),
+            ),
+        )
+        return cart
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cart = self.get_cart()
-        if cart:
-            # Оптимизируем запрос с prefetch_related
-            cart_items = cart.items.select_related('product').all()
-            context['cart_items'] = cart_items
-            context['total_items'] = cart.total_items
-            context['subtotal'] = cart.total_price
-            context['total'] = cart.total_price
+        cart = self.object
+        if isinstance(cart, AnonCart):
+            cart_items = cart.get_items()
+            total_price = sum(item.total_price for item in cart_items)
+            total_items = sum(item.quantity for item in cart_items)
         else:
-            context['cart_items'] = []
-            context['total_items'] = 0
-            context['subtotal'] = 0
-            context['total'] = 0
+            cart_items = cart.items.all()
+            total_price = cart.total_price
+            total_items = cart.total_items
+        context['cart_items'] = cart_items
+        context['total_items'] = total_items
+        context['subtotal'] = total_price
+        context['total'] = total_price
         return context
 
-    def get_cart(self):
-        """Получение корзины с оптимизацией"""
-        if self.request.user.is_authenticated:
-            cart, created = Cart.objects.get_or_create(user=self.request.user)
-        else:
-            session_key = self.request.session.session_key
-            if not session_key:
-                self.request.session.create()
-                session_key = self.request.session.session_key
-            cart, created = Cart.objects.get_or_create(session_key=session_key)
-        return cart
 
-
-# Миксин для повторяющейся логики корзины
-class CartMixin:
-    def get_cart(self, request):
-        """Получение корзины с оптимизацией"""
-        if request.user.is_authenticated:
-            cart, created = Cart.objects.get_or_create(user=request.user)
-        else:
-            session_key = request.session.session_key
-            if not session_key:
-                request.session.create()
-                session_key = request.session.session_key
-            cart, created = Cart.objects.get_or_create(session_key=session_key)
-        return cart
+def _get_available_product_name(product_id):
+    """Название доступного товара или None, если товара нет"""
+    return Product.objects.filter(
+        id=product_id, available=True
+    ).values_list('name', flat=True).first()
 
 
 @require_POST
+@save_anon_cart
+@with_cart
 def add_to_cart(request, product_id):
     """Добавление товара в корзину с улучшенной валидацией"""
     try:
         # Валидация входных данных
         if not request.body:
-            return JsonResponse(
+            return json_response(
                 {'success': False, 'message': 'Отсутствуют данные'}, status=400
             )
 
-        data = json.loads(request.body)
+        data = orjson.loads(request.body)
         quantity = int(data.get('quantity', 1))
 
         if quantity < 1:
-            return JsonResponse(
+            return json_response(
                 {
                     'success': False,
                     'message': 'Количество должно быть больше 0',
@@ -179,49 +254,83 @@ def add_to_cart(request, product_id):
             )
 
         if quantity > 99:  # Ограничиваем максимальное количество
-            return JsonResponse(
+            return json_response(
                 {'success': False, 'message': 'Максимальное количество: 99'},
                 status=400,
             )
 
-        product = get_object_or_404(Product, id=product_id, available=True)
-
-        # Используем миксин для получения корзины
-        cart_mixin = CartMixin()
-        cart = cart_mixin.get_cart(request)
-
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart, product=product, defaults={'quantity': quantity}
-        )
-
-        if not created:
-            cart_item.quantity += quantity
-            if cart_item.quantity > 99:
-                cart_item.quantity = 99
-            cart_item.save()
+        # Корзина запроса (декоратор with_cart)
+        cart = request.cart
+
+        if isinstance(cart, AnonCart):
+            product_name = _get_available_product_name(product_id)
+            if product_name is None:
+                return json_response(
+                    {'success': False, 'message': 'Товар не найден'}, status=404
+                )
+            if cart.add(product_id, quantity) is None:
+                return json_response(
+                    {'success': False, 'message': 'Корзина заполнена'},
+                    status=400,
+                )
+            return json_response(
+                {
+                    'success': True,
+                    'message': f'Товар "{product_name}" добавлен в корзину',
+                    'cart_total': cart.total_items,
+                }
+            )
 
-        # Инвалидируем кэш корзины
-        cache.delete(f'cart_{cart.id}')
+        # С Redis добавление только записывается в буфер, в БД его
+        # переносит flush_cart_buffer. Товар проверяется до записи в буфер:
+        # иначе успех вернулся бы и для товара, который сброс отбросит
+        if cart_buffer.is_enabled():
+            product_name = _get_available_product_name(product_id)
+            if product_name is None:
+                return json_response(
+                    {'success': False, 'message': 'Товар не найден'}, status=404
+                )
+            if cart_buffer.buffer_add(cart.id, product_id, quantity):
+                total_items = (
+                    Cart.get_totals(cart.id)['total_items']
+                    + cart_buffer.get_pending_quantity(cart.id)
+                )
+                return json_response(
+                    {
+                        'success': True,
+                        'message': f'Товар "{product_name}" добавлен в корзину',
+                        'cart_total': total_items,
+                    }
+                )
+
+        # Создание позиции или увеличение количества одним запросом;
+        # наличие и доступность товара проверяются в том же запросе
+        added = CartItem.add_quantity(cart.id, product_id, quantity)
+        if added is None:
+            return json_response(
+                {'success': False, 'message': 'Товар не найден'}, status=404
+            )
+        product_name = added[1]
 
-        return JsonResponse(
+        return json_response(
             {
                 'success': True,
-                'message': f'Товар "{product.name}" добавлен в корзину',
-                'cart_total': cart.total_items,
+                'message': f'Товар "{product_name}" добавлен в корзину',
+                'cart_total': Cart.get_totals(cart.id)['total_items'],
             }
         )
 
-    except json.JSONDecodeError:
-        return JsonResponse(
+    except orjson.JSONDecodeError:
+        return json_response(
             {'success': False, 'message': 'Неверный формат данных'}, status=400
         )
     except ValueError:
-        return JsonResponse(
+        return json_response(
             {'success': False, 'message': 'Неверное значение количества'},
             status=400,
         )
     except Exception:
-        return JsonResponse(
+        return json_response(
             {
                 'success': False,
                 'message': 'Произошла ошибка при добавлении товара',
@@ -231,14 +340,16 @@ def add_to_cart(request, product_id):
 
 
 @require_POST
+@save_anon_cart
+@with_cart
 def update_cart_item(request, item_id):
     """Обновление количества товара в корзине"""
     try:
-        data = json.loads(request.body)
+        data = orjson.loads(request.body)
         quantity = int(data.get('quantity', 1))
 
         if quantity < 1:
-            return JsonResponse(
+            return json_response(
                 {
                     'success': False,
                     'message': 'Количество должно быть больше 0',
@@ -247,80 +358,119 @@ def update_cart_item(request, item_id):
             )
 
         if quantity > 99:
-            return JsonResponse(
+            return json_response(
                 {'success': False, 'message': 'Максимальное количество: 99'},
                 status=400,
             )
 
-        cart_item = get_object_or_404(CartItem, id=item_id)
-        cart_item.quantity = quantity
-        cart_item.save()
+        if not request.user.is_authenticated:
+            # В анонимной корзине позиция адресуется id товара
+            anon_cart = request.cart
+            if not anon_cart.set_quantity(item_id, quantity):
+                return json_response(
+                    {'success': False, 'message': 'Товар не найден'}, status=404
+                )
+            new_total = sum(item.total_price for item in anon_cart.get_items())
+            return json_response(
+                {
+                    'success': True,
+                    'message': 'Количество обновлено',
+                    'new_total': new_total,
+                }
+            )
 
-        # Инвалидируем кэш корзины
-        cache.delete(f'cart_{cart_item.cart.id}')
+        cart_id = request.cart.id
+        # Отложенные добавления применяются раньше нового количества
+        if cart_buffer.is_enabled():
+            cart_buffer.flush_cart(cart_id)
 
-        return JsonResponse(
+        # UPDATE по первичному ключу (только в корзине пользователя)
+        # вместо загрузки и сохранения позиции
+        if not CartItem.set_quantity(cart_id, item_id, quantity):
+            return json_response(
+                {'success': False, 'message': 'Товар не найден'}, status=404
+            )
+
+        return json_response(
             {
                 'success': True,
                 'message': 'Количество обновлено',
-                'new_total': cart_item.cart.total_price,
+                'new_total': Cart.get_totals(cart_id)['total_price'],
             }
         )
 
-    except json.JSONDecodeError:
-        return JsonResponse(
+    except orjson.JSONDecodeError:
+        return json_response(
             {'success': False, 'message': 'Неверный формат данных'}, status=400
         )
     except ValueError:
-        return JsonResponse(
+        return json_response(
             {'success': False, 'message': 'Неверное значение количества'},
             status=400,
         )
     except Exception:
-        return JsonResponse(
+        return json_response(
             {'success': False, 'message': 'Произошла ошибка при обновлении'},
             status=500,
         )
 
 
 @require_POST
+@save_anon_cart
+@with_cart
 def remove_cart_item(request, item_id):
     """Удаление товара из корзины"""
     try:
-        cart_item = get_object_or_404(CartItem, id=item_id)
-        cart_id = cart_item.cart.id
-        cart_item.delete()
+        if not request.user.is_authenticated:
+            if not request.cart.remove(item_id):
+                return json_response(
+                    {'success': False, 'message': 'Товар не найден'}, status=404
+                )
+            return json_response(
+                {'success': True, 'message': 'Товар удален из корзины'}
+            )
+
+        cart_id = request.cart.id
+        if cart_buffer.is_enabled():
+            cart_buffer.flush_cart(cart_id)
 
-        # Инвалидируем кэш корзины
-        cache.delete(f'cart_{cart_id}')
+        # Удаляется только позиция корзины пользователя
+        deleted, _ = CartItem.objects.filter(pk=item_id, cart_id=cart_id).delete()
+        if not deleted:
+            return json_response(
+                {'success': False, 'message': 'Товар не найден'}, status=404
+            )
 
-        return JsonResponse(
+        return json_response(
             {'success': True, 'message': 'Товар удален из корзины'}
         )
 
     except Exception:
-        return JsonResponse(
+        return json_response(
             {'success': False, 'message': 'Произошла ошибка при удалении'},
             status=500,
         )
 
 
 @require_POST
+@save_anon_cart
+@with_cart
 def clear_cart(request):
     """Очистка корзины"""
     try:
-        cart_mixin = CartMixin()
-        cart = cart_mixin.get_cart(request)
+        cart = request.cart
 
-        cart.items.all().delete()
+        if isinstance(cart, AnonCart):
+            cart.clear()
+            return json_response({'success': True, 'message': 'Корзина очищена'})
 
-        # Инвалидируем кэш корзины
-        cache.delete(f'cart_{cart.id}')
+        cart_buffer.discard_cart(cart.id)
+        cart.items.all().delete()
 
-        return JsonResponse({'success': True, 'message': 'Корзина очищена'})
+        return json_response({'success': True, 'message': 'Корзина очищена'})
 
     except Exception:
-        return JsonResponse(
+        return json_response(
             {
                 'success': False,
                 'message': 'Произошла ошибка при очистке корзины',